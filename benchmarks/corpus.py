@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+import os
+import random
+
+shows = ["the simpsons", "marvels agents of shield", "dr who", "the x files", "bobs burgers", "game of thrones", "the office us",
+         "mr robot", "star trek discovery", "the man in the high castle", "its always sunny in philadelphia", "iZombie",
+         "brooklyn nine-nine", "the expanse", "attenborough life on earth", "childhoods end", "lego masters", "ufo hunters"]
+movies = ["rambo", "blade runner", "the lord of the rings the fellowship of the ring", "star wars a new hope", "who framed roger rabbit",
+          "c-3po adventures", "amelie", "la vie en rose", "lost in translation", "the good the bad and the ugly", "alien"]
+anime = ["naruto shippuden", "one piece", "attack on titan", "cowboy bebop", "fullmetal alchemist brotherhood", "mob psycho 100"]
+manga = ["berserk", "vagabond", "one punch man", "yotsuba&!", "akira", "20th century boys"]
+authors = ["terry pratchett", "ursula k le guin", "iain m banks", "n k jemisin", "j r r tolkien"]
+books = ["the colour of magic", "a wizard of earthsea", "consider phlebas", "the fifth season", "the hobbit"]
+artists = ["daft punk", "radiohead", "n.w.a", "eazy-e", "the beatles"]
+albums = ["discovery", "ok computer", "straight outta compton", "abbey road", "we want eazy"]
+
+resolutions = ["480p", "720p", "1080p", "2160p", "1280x720"]
+sources = ["hdtv", "web-dl", "web.dl", "webrip", "web rip", "bluray", "brrip", "bdrip", "dvdrip"]
+codecs = ["x264", "x265", "h.264", "H 265", "h264", "hevc", "xvid", "HEVC2"]
+audio = ["aac", "AAC2.0", "ac3", "dts", "DD5.1", "6ch", "flac"]
+groups = ["rarbg", "rmteam", "lol", "psa", "qcf", "utr", "ysteam", "dimension", "killers", "ntb"]
+subgroups = ["HorribleSubs", "deadfish", "KamiFS", "Erai-raws", "SubsPlease"]
+tags = ["proper", "repack", "internal", "(request)", "[ed]", "www.RapidMovieZ.com", "multi", "extended"]
+separators = [".", " ", "_", "-"]
+
+videoExtensions = [".mkv", ".mp4", ".avi", ".m4v"]
+extras = [".srt", ".nfo", ".jpg", ".txt", ".sfv"]
+
+class Corpus:
+  def __init__(self, seed=0):
+    self.random = random.Random(seed)
+
+  def choice(self, values):
+    return self.random.choice(values)
+
+  def release(self, words):
+    words = [w for w in words if w]
+    separator = self.choice(separators)
+    name = separator.join(separator.join(w.split(" ")) if separator != " " else w for w in words)
+    if self.random.random() < 0.05:
+      name = name.upper()
+    return name
+
+  def episode(self):
+    season, episode = self.random.randint(1, 15), self.random.randint(1, 24)
+    marker = self.choice(["s%02de%02d" % (season, episode), "S%02dE%02d" % (season, episode), "%dx%02d" % (season, episode), "ep%02d" % episode])
+    words = [self.choice(shows), marker, self.choice(resolutions), self.choice(sources), self.choice(codecs)]
+    if self.random.random() < 0.5:
+      words.append(self.choice(audio))
+    words.append(self.choice(groups))
+    if self.random.random() < 0.1:
+      words.insert(2, self.choice(tags))
+    return self.release(words) + self.choice(videoExtensions)
+
+  def movie(self):
+    words = [self.choice(movies), "(%d)" % self.random.randint(1950, 2020), self.choice(resolutions), self.choice(sources),
+             self.choice(codecs), self.choice(audio), self.choice(groups)]
+    return self.release(words) + self.choice(videoExtensions)
+
+  def anime(self):
+    name = "[%s] %s - %02d [%s]" % (self.choice(subgroups), self.choice(anime).title(), self.random.randint(1, 500), self.choice(resolutions))
+    if self.random.random() < 0.5:
+      name += "[%08X]" % self.random.getrandbits(32)
+    return name + ".mkv"
+
+  def manga(self):
+    volume = self.choice(["v%02d", "vol. %d", "Vol%d", "volume %d", "c%03d", "ch. %d", "chapters %d"]) % self.random.randint(1, 120)
+    words = [self.choice(manga), volume, "(%d)" % self.random.randint(1990, 2020), "(Digital)"]
+    return self.release(words) + self.choice([".cbz", ".cbr", ".zip", ".rar", ".7z"])
+
+  def book(self):
+    name = "%s - %s (%d)" % (self.choice(authors), self.choice(books), self.random.randint(1950, 2020))
+    return name + self.choice([".epub", ".mobi", ".pdf", ".azw3"])
+
+  def album(self):
+    words = [self.choice(artists), "-", self.choice(albums), "(%d)" % self.random.randint(1960, 2020), "[%s]" % self.choice(["FLAC", "MP3", "320"])]
+    return self.release(words)
+
+  def track(self):
+    return "%02d. %s - %s.%s" % (self.random.randint(1, 20), self.choice(artists), self.choice(albums), self.choice(["mp3", "flac", "m4a"]))
+
+  def name(self):
+    kind = self.random.random()
+    if kind < 0.4:
+      return self.episode()
+    elif kind < 0.55:
+      return self.movie()
+    elif kind < 0.7:
+      return self.anime()
+    elif kind < 0.8:
+      return self.manga()
+    elif kind < 0.9:
+      return self.book()
+    elif kind < 0.95:
+      return self.track()
+    else:
+      return os.path.splitext(self.choice([self.episode, self.movie])())[0] + self.choice(extras)
+
+  def names(self, count):
+    return [self.name() for i in range(count)]
+
+  def tree(self, root, files, filesPerDirectory=20, depth=3):
+    directories = [root]
+    created = 0
+    os.makedirs(root, exist_ok=True)
+
+    while created < files:
+      parent = self.choice(directories)
+      if parent.count(os.sep) - root.count(os.sep) < depth and self.random.random() < 1.0 / filesPerDirectory:
+        directory = os.path.join(parent, self.choice([self.album, self.movie, lambda: os.path.splitext(self.episode())[0]])())
+        if not os.path.exists(directory):
+          os.mkdir(directory)
+          directories.append(directory)
+        continue
+
+      path = os.path.join(parent, self.name())
+      if not os.path.exists(path):
+        open(path, "w").close()
+        created += 1
+
+    return directories
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import string
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.corpus import Corpus
+from organizer import config
+from organizer import pipeline
+from organizer.cleaner import FileCleaner
+from organizer.literal import Literals
+from organizer.main import arguments
+from organizer.normalization import FileNormalization
+from organizer.organizer import Organizer
+
+def best(repeat, function):
+  times = []
+  for i in range(repeat):
+    start = time.perf_counter()
+    function()
+    times.append(time.perf_counter() - start)
+  return min(times)
+
+def normalize(names, repeat):
+  cleaner = FileCleaner(arguments(['.']))
+  logging.getLogger().setLevel(logging.ERROR)
+  elapsed = best(repeat, lambda: [cleaner.normalize(FileNormalization('.', name)) for name in names])
+  return {'count': len(names), 'seconds': elapsed, 'rate': len(names) / elapsed, 'unit': 'names/sec'}
+
+def literals(names, sizes, seed, repeat):
+  generator = random.Random(seed)
+  characters = string.ascii_letters + string.digits
+  previous = config.literals, list(config.postSubstitutions), list(config.extraLiterals)
+  results = {}
+
+  try:
+    for size in sizes:
+      words = [''.join(generator.choice(characters) for i in range(generator.randint(3, 10))) for j in range(size)]
+      start = time.perf_counter()
+      config.extendLiterals(Literals(*words))
+      compiled = time.perf_counter() - start
+
+      result = normalize(names, repeat)
+      result['literals'] = size
+      result['compile'] = compiled
+      results['literals-%s' % size] = result
+
+      config.literals, config.postSubstitutions[:], config.extraLiterals[:] = previous
+      pipeline.reset()
+  finally:
+    config.literals, config.postSubstitutions[:], config.extraLiterals[:] = previous
+    pipeline.reset()
+
+  return results
+
+def classify(names, repeat):
+  organizer = Organizer(arguments(['.']))
+  elapsed = best(repeat, lambda: [organizer.fileType(name) for name in names])
+  return {'count': len(names), 'seconds': elapsed, 'rate': len(names) / elapsed, 'unit': 'files/sec'}
+
+def rename(files, seed, repeat, options):
+  parent = '/dev/shm' if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK) else None
+  times = []
+
+  with tempfile.TemporaryDirectory(prefix='organizer-bench-', dir=parent) as temporary:
+    for i in range(repeat):
+      root = os.path.join(temporary, str(i))
+      Corpus(seed).tree(root, files)
+      cleaner = FileCleaner(arguments([root] + options))
+      logging.getLogger().setLevel(logging.ERROR)
+
+      start = time.perf_counter()
+      cleaner.process()
+      times.append(time.perf_counter() - start)
+      shutil.rmtree(root)
+
+  elapsed = min(times)
+  return {'count': files, 'seconds': elapsed, 'rate': files / elapsed, 'unit': 'files/sec', 'filesystem': parent or tempfile.gettempdir()}
+
+def commit():
+  try:
+    return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL, text=True).strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+def compare(results, baseline, threshold):
+  regressions = []
+  for name, result in results['benchmarks'].items():
+    previous = baseline.get('benchmarks', {}).get(name)
+    if previous is None:
+      continue
+
+    change = result['rate'] / previous['rate'] - 1
+    print('%-16s %12.0f %-10s %+6.1f%% vs %s' % (name, result['rate'], result['unit'], change * 100, baseline.get('commit')))
+    if change < -threshold:
+      regressions.append(name)
+
+  return regressions
+
+def main():
+  parser = argparse.ArgumentParser(description='Measures normalization, classification and rename throughput on a synthetic release name corpus.')
+  parser.add_argument('-b', '--baseline', action='store', metavar='file', help='Compare against the results of a previous run')
+  parser.add_argument('-f', '--files', action='store', type=int, default=5000, metavar='N', help='The number of files in the rename tree. Default is 5000')
+  parser.add_argument('-l', '--literals', action='store', default='100,1000,10000,100000', metavar='N,...', help='Normalize the names again with this many extra literals loaded. Default is 100,1000,10000,100000')
+  parser.add_argument('-n', '--names', action='store', type=int, default=20000, metavar='N', help='The number of generated names. Default is 20000')
+  parser.add_argument('-o', '--output', action='store', metavar='file', help='Write the results as JSON')
+  parser.add_argument('-r', '--repeat', action='store', type=int, default=3, metavar='N', help='Keep the best of N runs. Default is 3')
+  parser.add_argument('-s', '--seed', action='store', type=int, default=0, metavar='N', help='The corpus seed. Default is 0')
+  parser.add_argument('-t', '--threshold', action='store', type=float, default=0.1, metavar='ratio', help='Fail when a rate drops by more than this ratio against the baseline. Default is 0.1')
+  parser.add_argument('options', nargs=argparse.REMAINDER, help='Extra organizer options for the rename benchmark, e.g. -- --jobs 4')
+  args = parser.parse_args()
+
+  options = [o for o in args.options if o != '--']
+  names = Corpus(args.seed).names(args.names)
+  results = {
+    'commit': commit(),
+    'python': platform.python_version(),
+    'seed': args.seed,
+    'benchmarks': {
+      'normalize': normalize(names, args.repeat),
+      'classify': classify(names, args.repeat),
+      'rename': rename(args.files, args.seed, args.repeat, options)
+    }
+  }
+  results['benchmarks'].update(literals(names, [int(size) for size in args.literals.split(',') if size], args.seed, args.repeat))
+
+  for name, result in results['benchmarks'].items():
+    print('%-16s %12.0f %s' % (name, result['rate'], result['unit']))
+
+  if args.output:
+    with open(args.output, 'w') as f:
+      json.dump(results, f, indent=2)
+
+  if args.baseline:
+    with open(args.baseline) as f:
+      regressions = compare(results, json.load(f), args.threshold)
+    if regressions:
+      print('Regression beyond %d%%: %s' % (args.threshold * 100, ', '.join(regressions)))
+      sys.exit(1)
+
+if __name__ == '__main__':
+  main()
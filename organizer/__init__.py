@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+# Library use stays silent unless the application configures logging
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+from organizer.names import normalize_names
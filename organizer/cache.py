@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import os
+import types
+
+from organizer import config
+from organizer.literal import Literals
+from organizer.normalization import DirectoryNormalization
+from organizer.substitution import Substitution
+
+logger = logging.getLogger(__name__)
+
+cacheDirectory = os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'organizer')
+defaultPath = os.path.join(cacheDirectory, 'names.db')
+
+def signature(value):
+  if isinstance(value, Substitution):
+    return (value.source, value.flags, signature(value.replacement), signature(value.ext))
+  if isinstance(value, Literals):
+    return tuple(value.literals.values())
+  if isinstance(value, types.MethodType):
+    return (signature(value.__self__), signature(value.__func__))
+  if isinstance(value, types.FunctionType):
+    return signature(value.__code__)
+  if isinstance(value, types.CodeType):
+    return (value.co_code, tuple(signature(c) for c in value.co_consts), value.co_names)
+  return value
+
+def fingerprint():
+  from organizer import casing
+  from organizer import cleaner
+  import hashlib
+  import titlecase
+
+  rules = [signature(s) for s in config.preSubstitutions + config.postSubstitutions]
+  literals = [signature(v) for k, v in sorted(vars(config).items()) if isinstance(v, Literals)]
+  digest = hashlib.sha1(repr((rules, literals, sorted(config.skippedFiles), signature(cleaner.normalize), signature(casing.Titlecaser.convert), titlecase.__version__)).encode('utf-8', 'surrogateescape'))
+  return digest.hexdigest()
+
+class NormalizationCache:
+  def __init__(self, path, maxEntries, fingerprint):
+    import sqlite3
+
+    self.maxEntries = maxEntries
+    self.pending = []
+    self.used = []
+
+    directory = os.path.dirname(path)
+    if directory != '':
+      os.makedirs(directory, exist_ok=True)
+
+    # Interactive runs look names up from the thread normalizing ahead
+    self.connection = sqlite3.connect(path, check_same_thread=False)
+    self.connection.executescript('''
+      CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+      CREATE TABLE IF NOT EXISTS names (
+        name TEXT NOT NULL, extension TEXT NOT NULL, directory INTEGER NOT NULL, maxLength INTEGER NOT NULL,
+        normalized TEXT NOT NULL, generation INTEGER NOT NULL,
+        PRIMARY KEY (name, extension, directory, maxLength));
+      CREATE INDEX IF NOT EXISTS names_generation ON names (generation);
+    ''')
+
+    if self.meta('fingerprint') != fingerprint:
+      logger.debug('Normalization rules changed, clearing cache: %s', path)
+      self.connection.execute('DELETE FROM names')
+      self.setMeta('fingerprint', fingerprint)
+
+    self.generation = int(self.meta('generation') or 0) + 1
+    self.setMeta('generation', self.generation)
+    self.connection.commit()
+
+  def meta(self, key):
+    row = self.connection.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+    return row[0] if row else None
+
+  def setMeta(self, key, value):
+    self.connection.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', (key, str(value)))
+
+  def key(self, normalization, maxLength):
+    return (normalization.originalName, normalization.extension, isinstance(normalization, DirectoryNormalization), maxLength)
+
+  def get(self, normalization, maxLength):
+    key = self.key(normalization, maxLength)
+    try:
+      row = self.connection.execute('SELECT normalized FROM names WHERE name = ? AND extension = ? AND directory = ? AND maxLength = ?', key).fetchone()
+    except UnicodeEncodeError:
+      return None
+
+    if row is None:
+      return None
+
+    self.used.append(key)
+    if len(self.used) >= 1000:
+      self.flush()
+    return row[0]
+
+  def put(self, normalization, maxLength):
+    key = self.key(normalization, maxLength)
+    try:
+      key[0].encode('utf-8')
+      normalization.name.encode('utf-8')
+    except UnicodeEncodeError:
+      return
+
+    self.pending.append(key + (normalization.name, self.generation))
+    if len(self.pending) >= 1000:
+      self.flush()
+
+  def flush(self):
+    with self.connection:
+      self.connection.executemany('INSERT OR REPLACE INTO names VALUES (?, ?, ?, ?, ?, ?)', self.pending)
+      self.connection.executemany('UPDATE names SET generation = %d WHERE name = ? AND extension = ? AND directory = ? AND maxLength = ?' % self.generation, self.used)
+    self.pending = []
+    self.used = []
+
+  def evict(self):
+    count = self.connection.execute('SELECT COUNT(*) FROM names').fetchone()[0]
+    if count > self.maxEntries:
+      logger.debug('Evicting %s cached names', count - self.maxEntries)
+      with self.connection:
+        self.connection.execute('DELETE FROM names WHERE rowid IN (SELECT rowid FROM names ORDER BY generation LIMIT ?)', (count - self.maxEntries,))
+
+  def close(self):
+    self.flush()
+    self.evict()
+    self.connection.close()
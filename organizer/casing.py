@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+
+import functools
+import logging
+import string
+
+from organizer import config
+
+logger = logging.getLogger(__name__)
+
+# Mirrors the per word rules of this titlecase release, other releases are used as is
+mirrored = '2.4.1'
+library = None
+consonants = None
+
+def load():
+  # titlecase and its regex dependency are slow to import, wait until a name is titlecased
+  global library, consonants
+  if library is None:
+    import titlecase
+    consonants = titlecase.regex.compile(r'\A[%s]+\Z' % ''.join(sorted(set(string.ascii_lowercase) - set('aeiouy'))), titlecase.regex.IGNORECASE)
+    library = titlecase
+
+class Titlecaser:
+  def __init__(self, callback=None, size=1 << 16):
+    load()
+    self.callback = callback
+    self.word = functools.lru_cache(size)(self.convert)
+
+  def titlecase(self, text):
+    result = self.line(text, True)
+    if library.logger.isEnabledFor(logging.DEBUG):
+      library.logger.debug(result)
+    return result
+
+  def line(self, text, smallFirstLast):
+    if library.__version__ != mirrored or '\n' in text or '\r' in text:
+      return library.titlecase(text, self.callback, smallFirstLast)
+
+    allCaps = text.upper() == text
+    words = text.split(' ') if '\t' not in text else library.regex.split('[\t ]', text)
+    converted = [self.word(word, allCaps) for word in words]
+
+    if smallFirstLast and converted:
+      first, immutable = converted[0]
+      if not immutable:
+        converted[0] = (library.SMALL_FIRST.sub(lambda m: '%s%s' % (m.group(1), m.group(2).capitalize()), first), False)
+
+      last, immutable = converted[-1]
+      if not immutable:
+        converted[-1] = (library.SMALL_LAST.sub(lambda m: m.group(0).capitalize(), last), False)
+
+    result = ' '.join(word for word, immutable in converted)
+    return library.SUBPHRASE.sub(lambda m: '%s%s' % (m.group(1), m.group(2).capitalize()), result)
+
+  def convert(self, word, allCaps):
+    # Returns the titlecased word and whether first/last word rules must leave it alone
+    if self.callback:
+      replacement = self.callback(word, all_caps=allCaps)
+      if replacement:
+        return replacement, True
+
+    if allCaps and library.UC_INITIALS.match(word):
+      return word, False
+
+    if library.APOS_SECOND.match(word):
+      if word[0] not in 'aeiouAEIOU':
+        return word[0].lower() + word[1] + word[2].upper() + word[3:], False
+      return word[0].upper() + word[1] + word[2].upper() + word[3:], False
+
+    match = library.MAC_MC.match(word)
+    if match:
+      return '%s%s' % (match.group(1).capitalize(), self.line(match.group(2), True)), False
+
+    if library.MR_MRS_MS_DR.match(word):
+      return word[0].upper() + word[1:], False
+
+    if library.INLINE_PERIOD.search(word) or (not allCaps and library.UC_ELSEWHERE.match(word)):
+      return word, False
+
+    if library.SMALL_WORDS.match(word):
+      return word.lower(), False
+
+    if '/' in word and '//' not in word:
+      return '/'.join(self.line(part, False) for part in word.split('/')), False
+
+    if '-' in word:
+      return '-'.join(self.line(part, False) for part in word.split('-')), False
+
+    if allCaps:
+      word = word.lower()
+
+    if len(word) > 2 and consonants.search(word):
+      return word.upper(), False
+
+    return library.CAPFIRST.sub(lambda m: m.group(0).upper(), word), False
+
+def literalCallback(literals):
+  # Literals starting in lowercase keep their title case at the start of a name, so only the others are final here
+  canonical = {key: literal for key, literal in literals.map.items() if not literal[0:1].islower()}
+
+  def callback(word, all_caps=False):
+    return canonical.get(word.lower())
+
+  return callback
+
+_titlecaser = None
+
+def titlecase(text):
+  global _titlecaser
+  if _titlecaser is None or _titlecaser[0] is not config.literals:
+    _titlecaser = (config.literals, Titlecaser(literalCallback(config.literals)))
+  return _titlecaser[1].titlecase(text)
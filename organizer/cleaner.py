@@ -1,60 +1,292 @@
 # -*- coding: utf-8 -*-
 
+from collections import Counter
 import os
 import re
 import string
 import logging
-import readline
-import sys
-import titlecase
+import time
 
-import organizer.substitution
+from organizer import casing
 from organizer import config
+from organizer import metrics
+from organizer import profile
 from organizer.normalization import *
+from organizer.pipeline import pipelines
+from organizer.scanner import Scanner, listDirectory
 
 logger = logging.getLogger(__name__)
 
 class FileCleaner:
+  batchSize = 4096
+  # Batches normalized ahead of an interactive prompt
+  lookahead = 8
 
   def __init__(self, args):
     self.args = args
+    self.cache = None
+    self.index = None
+    self.plan = None
+    self.pool = None
+    self.produced = None
+    self.purger = None
+    self.collisions = None
+    self.metrics = None
+    self.organizer = None
+    self.reviewing = None
+    self.counts = Counter()
 
-    logfile = "organizer.log"
-    level = logging.DEBUG if args.verbose else logging.INFO
-    logger = logging.getLogger()
-    logger.setLevel(level)
+  def process(self, watch=False):
+    self.open()
+    try:
+      if watch:
+        from organizer.watch import Watcher
+        watcher = Watcher(self, self.args.settle, self.args.poll or 2.0, self.args.poll is not None)
+        self.cleanAll(watcher.complete(self.batches(self.args.directory)))
+        watcher.watch()
+      else:
+        self.cleanAll(self.batches(self.args.directory))
+    except KeyboardInterrupt:
+      pass
+    finally:
+      self.close()
+
+  def filter(self, input, output):
+    self.open()
+    try:
+      from organizer.stream import NameFilter
+      NameFilter(self, self.args.null, self.args.json).filter(input, output)
+    except KeyboardInterrupt:
+      pass
+    finally:
+      self.close()
+
+  def open(self):
+    if self.args.profile or self.args.profile_json:
+      profile.start()
+
+    if self.args.metrics or self.args.metrics_json:
+      self.metrics = metrics.start(self.args.metrics, self.args.metrics_json, self.args.metrics_interval)
+
+    # Only load what the options ask for, most runs need none of it
+    if self.args.cache:
+      from organizer.cache import NormalizationCache, fingerprint
+      self.cache = NormalizationCache(self.args.cache_file, self.args.cache_size, fingerprint())
+
+    if self.args.plan:
+      from organizer.journal import Plan
+      self.plan = Plan(self.args.plan)
+
+    from organizer.cache import cacheDirectory
+    from organizer.duplicate import CollisionPolicy, DuplicateDetector
+    self.collisions = CollisionPolicy(self.args.collision, DuplicateDetector(os.path.join(cacheDirectory, 'digests.db')), bool(self.args.plan))
+
+    if self.args.purge:
+      from organizer.purge import Purger
+      # Downloads in progress are left alone while watching, the finished file drops the suffix
+      patterns = config.deleteFiles - config.partialFiles if self.args.watch else config.deleteFiles
+      # A plan can't record deletions, so only show them
+      self.purger = Purger(patterns, self.args.dry_run or bool(self.args.plan), self.args.interactive, self.args.scan_threads)
+
+    if self.args.incremental or self.args.full:
+      from organizer.cache import fingerprint
+      from organizer.index import DirectoryIndex
+      self.index = DirectoryIndex(self.args.index, self.args.directory, '%s:%s:%s' % (fingerprint(), self.args.max_length, self.args.purge), self.args.full)
+
+    if self.args.review:
+      self.reviewing = []
 
-    consoleHandler = logging.StreamHandler(stream=sys.stdout)
-    logger.addHandler(consoleHandler)
+    # Sorting happens in the same walk, each top level entry is moved once everything below it is clean
+    if self.args.output:
+      from organizer.organizer import Organizer
+      self.organizer = Organizer(self.args, self.plan)
 
-    if args.log:
-        formatter = logging.Formatter("%(asctime)s [%(levelname)s]\t%(message)s")
-        fileHandler = logging.FileHandler(logfile)
-        fileHandler.setFormatter(formatter)
-        logger.addHandler(fileHandler)
+    # Interactive runs always normalize in a worker process, which captures the log output of names normalized ahead
+    if self.args.jobs > 1 or self.interactive():
+      from organizer.parallel import NormalizationPool
+      self.pool = NormalizationPool(max(self.args.jobs, 1), self.args.max_length, self.cache, profile.profiler)
+
+  def interactive(self):
+    return self.args.interactive or self.args.semi_interactive or self.args.review
+
+  def close(self, summary=True):
+    if self.pool:
+      self.pool.close()
+    if self.organizer:
+      self.organizer.close()
+    if self.purger:
+      self.purger.close(summary)
+    if self.collisions:
+      self.collisions.detector.close()
+    if self.cache:
+      self.cache.close()
+    if self.index:
+      self.index.save()
+    if self.plan:
+      self.plan.close()
+    if self.metrics:
+      metrics.stop()
+      self.metrics.write()
+    if profile.profiler:
+      profiler = profile.stop()
+      if summary:
+        self.report(profiler)
+
+  def cleanAll(self, batches):
+    batches = self.pool.normalize(batches) if self.pool else ((directory, batch, None) for directory, batch in batches)
+
+    # While a prompt waits for an answer, the walk and normalization carry on in the background
+    prefetcher = None
+    if self.interactive():
+      from organizer.prefetch import Prefetcher
+      batches = prefetcher = Prefetcher(self.warm(batches), self.lookahead)
 
-  def process(self):
     try:
-      for directory, directories, files in os.walk(self.args.directory, topdown = False):
+      # Large directories arrive in several consecutive batches
+      current = None
+      for directory, batch, records in batches:
+        if directory != current:
+          if current is not None:
+            self.finishDirectory(current)
+          self.startDirectory(directory)
+          current = directory
+        self.cleanBatch(batch, records)
 
-        for dir in sorted(directories):
-          self.clean(DirectoryNormalization(directory, dir), True)
+      if current is not None:
+        self.finishDirectory(current)
+    finally:
+      if prefetcher:
+        prefetcher.close()
 
-        first = True
-        for file in sorted(files):
-          if file not in config.skippedFiles:
-            first = self.clean(FileNormalization(directory, file), first)
-    except KeyboardInterrupt:
-      pass
+  def warm(self, batches):
+    # Renamed entries are checked before they are shown, stat them ahead so a slow mount has them cached
+    for directory, batch, records in batches:
+      for normalization in batch:
+        if normalization.changed():
+          try:
+            os.lstat(normalization.original(True))
+          except OSError:
+            pass
+      yield directory, batch, records
+
+  def normalizeAll(self, batches):
+    if self.pool:
+      for directory, batch, records in self.pool.normalize(batches):
+        for log in records:
+          self.replay(log)
+        yield directory, batch
+    else:
+      for directory, batch in batches:
+        for normalization in batch:
+          self.normalize(normalization)
+        yield directory, batch
+
+  def replay(self, records):
+    for record in records:
+      logging.getLogger(record.name).handle(record)
+
+  def report(self, profiler):
+    if self.args.profile_json:
+      profiler.write(self.args.profile_json)
+    else:
+      profiler.report()
+
+  def batches(self, directory, recursive=True):
+    if not recursive:
+      walk = self.listing(directory)
+    elif self.index and directory == self.args.directory:
+      walk = self.index.walk(self.purger, self.args.spill)
+    else:
+      walk = Scanner(self.args.scan_threads, purger=self.purger, limit=self.args.spill).walk(directory)
+
+    if metrics.registry:
+      walk = self.measure(walk)
+
+    # Both walks list entries in sorted order, possibly streamed back from disk for huge directories
+    for directory, directories, files in walk:
+      batch = []
+      for name in directories:
+        batch.append(DirectoryNormalization(directory, name))
+        if len(batch) == self.batchSize:
+          yield directory, batch
+          batch = []
+
+      for name in files:
+        if name not in config.skippedFiles:
+          batch.append(FileNormalization(directory, name))
+          if len(batch) == self.batchSize:
+            yield directory, batch
+            batch = []
+
+      yield directory, batch
+
+  def measure(self, walk):
+    registry = metrics.registry
+    walk = iter(walk)
+    while True:
+      start = time.perf_counter()
+      listing = next(walk, None)
+      registry.phase('walk', time.perf_counter() - start)
+      if listing is None:
+        return
 
-  def clean(self, normalization, first):
+      registry.count('directories')
+      registry.count('files', len(listing[2]))
+      yield listing
+
+  def listing(self, directory):
+    listing = listDirectory(directory, self.purger.matches if self.purger else None, self.args.spill)
+    if listing is not None:
+      if listing.pruned:
+        self.purger.prune(directory, listing.pruned)
+      yield directory, listing.directories, listing.files
+
+  def startDirectory(self, directory):
+    self.renamed = []
+    self.complete = True
+    self.first = True
+    self.counts['directories'] += 1
+
+    if self.purger:
+      self.purger.purge(directory)
+
+  def finishDirectory(self, directory):
+    if self.index:
+      self.index.update(directory, self.renamed, self.complete)
+    if self.organizer and directory == self.organizer.root:
+      self.organizer.finish()
+
+  def cleanBatch(self, batch, records=None):
+    for i, normalization in enumerate(batch):
+      precomputed = records[i] if records is not None else None
+      if isinstance(normalization, DirectoryNormalization):
+        self.clean(normalization, True, precomputed)
+      else:
+        self.first = self.clean(normalization, self.first, precomputed)
+
+    if self.reviewing:
+      self.review()
+    if self.organizer:
+      self.organizer.classify()
+
+  def clean(self, normalization, first, records=None):
     original = normalization.original(True)
     logger.debug("Visiting: %s", original)
-    confirm = False
+    self.counts['names'] += 1
+
+    if records is None:
+      self.normalize(normalization)
+    else:
+      # Normalized by a worker process, replay its log output in order
+      self.replay(records)
 
-    self.normalize(normalization)
+    renamed = False
+    if normalization.changed() and metrics.timed('stat', os.path.exists, original):
+      self.counts['changed'] += 1
+      if self.reviewing is not None:
+        self.reviewing.append(normalization)
+        return first
 
-    if normalization.changed() and os.path.exists(original):
       confirm = not self.args.dry_run
       logger.info('%s =>', normalization.original())
       logger.info('%s', normalization.normalized())
@@ -67,46 +299,197 @@ class FileCleaner:
         if result == 'e' or result == 'edit':
           confirm = True
           first = True
-          readline.set_startup_hook(lambda: readline.insert_text(normalization.normalized()))
-          normalization.setName(input())
-          readline.set_startup_hook(None)
+          self.edit(normalization)
 
-      if confirm:
-        try:
-          logger.debug("Renaming: %s", normalization.normalized(True))
-          os.renames(original, normalization.normalized(True))
-        except Exception as e:
-          logger.error("Unable to rename: %s", e)
+      renamed = self.apply(normalization, confirm)
 
+    if self.organizer:
+      self.visit(normalization, renamed)
     return first
 
-  def normalize(self, normalization):
-    name = normalization.getName()
+  def visit(self, normalization, renamed):
+    path = normalization.normalized(True) if renamed else normalization.original(True)
+    self.organizer.visit(normalization.directory, path, isinstance(normalization, DirectoryNormalization), normalization.normalized(), normalization.original(True))
+
+  def edit(self, normalization):
+    import readline
+    readline.set_startup_hook(lambda: readline.insert_text(normalization.normalized()))
+    try:
+      normalization.setName(input())
+    finally:
+      readline.set_startup_hook(None)
+
+  def review(self):
+    # The renames of a directory are listed at once and confirmed with a single answer
+    reviewing, self.reviewing = self.reviewing, []
+    skipped = set()
+    print(reviewing[0].directory)
+    for i in range(len(reviewing)):
+      self.show(reviewing, i, skipped)
+
+    while True:
+      result = input(r"Rename %s of %s? (Yes/No/All/Edit N/Skip N) " % (len(reviewing) - len(skipped), len(reviewing))).strip().lower()
+      command, _, lines = result.partition(' ')
+      if command in ('y', 'yes'):
+        break
+      if command in ('a', 'all'):
+        # Stop reviewing, the rest of the run renames without asking
+        self.reviewing = None
+        break
+      if command in ('n', 'no'):
+        skipped = set(range(len(reviewing)))
+        break
+
+      if command in ('e', 'edit', 's', 'skip'):
+        for i in self.lines(lines, len(reviewing)):
+          if command in ('e', 'edit'):
+            self.edit(reviewing[i])
+            skipped.discard(i)
+          else:
+            skipped ^= {i}
+          self.show(reviewing, i, skipped)
+      else:
+        print('Answer Yes, No, All, Edit N or Skip N, e.g. Skip 2-4')
+
+    for i, normalization in enumerate(reviewing):
+      renamed = False
+      if i in skipped:
+        self.complete = False
+      else:
+        logger.info('%s =>', normalization.original())
+        logger.info('%s', normalization.normalized())
+        renamed = self.apply(normalization, not self.args.dry_run)
 
-    if name.count("-") > 3 and name.count(" ") == 0:
-      name = name.replace("-", " ")
+      if self.organizer:
+        self.visit(normalization, renamed)
+
+  def show(self, reviewing, i, skipped):
+    print('%5d%s %s =>' % (i + 1, '-' if i in skipped else ' ', reviewing[i].original()))
+    print('       %s' % reviewing[i].normalized())
+
+  def lines(self, lines, count):
+    # Line numbers and ranges such as 3 5-7, as shown by review
+    selected = []
+    for part in lines.replace(',', ' ').split():
+      first, _, last = part.partition('-')
+      try:
+        first, last = int(first), int(last or first)
+      except ValueError:
+        print('Not a line number: %s' % part)
+        continue
+      if not 0 < first <= last <= count:
+        print('No such lines: %s' % part)
+        continue
+      selected.extend(range(first - 1, last))
+    return selected
+
+  def apply(self, normalization, confirm):
+    original = normalization.original(True)
+    start = time.perf_counter()
+    if confirm and self.collisions:
+      confirm = self.resolve(normalization)
+
+    renamed = False
+    if confirm and self.plan:
+      self.plan.add('rename', original, normalization.normalized(True))
+      self.countRename()
+      self.complete = False
+      renamed = True
+    elif confirm:
+      try:
+        logger.debug("Renaming: %s", normalization.normalized(True))
+        metrics.timed('rename', os.renames, original, normalization.normalized(True))
+        self.countRename()
+        renamed = True
+        if isinstance(normalization, DirectoryNormalization):
+          self.renamed.append((normalization.original(), normalization.normalized()))
+        if self.produced is not None:
+          self.produced.add(normalization.normalized(True))
+      except Exception as e:
+        logger.error("Unable to rename: %s", e)
+        self.counts['failed'] += 1
+        self.complete = False
+    else:
+      self.complete = False
+
+    if metrics.registry:
+      metrics.registry.phase('apply', time.perf_counter() - start)
+    return renamed
+
+  def countRename(self):
+    self.counts['renamed'] += 1
+    if metrics.registry:
+      metrics.registry.count('renames')
+
+  def resolve(self, normalization):
+    original = normalization.original(True)
+    try:
+      target = self.collisions.resolve(original, normalization.normalized(True))
+    except OSError as e:
+      logger.error("Unable to rename: %s", e)
+      self.counts['failed'] += 1
+      target = None
+
+    if target is None:
+      self.complete = False
+      return False
+
+    if target != normalization.normalized(True):
+      normalization.setName(os.path.basename(target))
+      logger.info('Renaming to %s instead', normalization.normalized())
+
+    if self.plan:
+      self.collisions.reserve(target, original)
+    return True
+
+  def normalize(self, normalization):
+    start = time.perf_counter()
+    if self.cache:
+      name = self.cache.get(normalization, self.args.max_length)
+      if name is not None:
+        normalization.name = name
+        self.normalized('cache_hits', start)
+        return
 
-    if name.count("_") >= 2:
-      name = name.replace("_", " ")
+    # Truncated names stay out of the cache, so every run logs their warning
+    if not normalize(normalization, self.args.max_length) and self.cache:
+      self.cache.put(normalization, self.args.max_length)
+    self.normalized('normalizations', start)
 
-    normalization.setName(name)
+  def normalized(self, counter, start):
+    if metrics.registry:
+      metrics.registry.count(counter)
+      metrics.registry.phase('normalize', time.perf_counter() - start)
 
-    for substitution in config.preSubstitutions:
-      substitution.replace(normalization)
+def normalize(normalization, maxLength):
+  pre, post = pipelines()
+  extension = normalization.extension
+  name = normalization.getName()
 
-    name = titlecase.titlecase(normalization.getName())
-    normalization.setName(name)
+  if name.count("-") > 3 and name.count(" ") == 0:
+    name = name.replace("-", " ")
 
-    logger.debug('Titlecase => %s', name)
+  if name.count("_") >= 2:
+    name = name.replace("_", " ")
 
-    for substitution in config.postSubstitutions:
-      substitution.replace(normalization)
+  name = pre.run(trim(name, extension), extension)
+  if profile.profiler:
+    start = time.perf_counter_ns()
+    name = trim(casing.titlecase(name), extension)
+    profile.profiler.stat('titlecase').add(time.perf_counter_ns() - start, True)
+  else:
+    name = trim(casing.titlecase(name), extension)
 
-    name = normalization.normalized()
-    if len(name) > self.args.max_length:
-      slice = self.args.max_length - 1 - len(normalization.extension)
-      shortened = normalization.getName()[0:slice] + "…"
-      normalization.setName(shortened)
-      logger.warning('Truncated filename length from %s to %s: %s', len(name), len(shortened), name)
+  logger.debug('Titlecase => %s', name)
 
+  name = post.run(name, extension)
+  normalization.name = name
 
+  if len(name) + len(extension) > maxLength:
+    original = name + extension
+    slice = maxLength - 1 - len(extension)
+    shortened = name[0:slice] + "…"
+    normalization.setName(shortened)
+    logger.warning('Truncated filename length from %s to %s: %s', len(original), len(shortened), original, extra={'metric': 'truncations'})
+    return True
+  return False
@@ -5,6 +5,7 @@ from organizer.substitution import *
 
 skippedFiles = set(['cover.jpg', 'metadata.opf', '.DS_Store'])
 deleteFiles = set(['__MACOSX', '.DS_Store', '*.website', '*.url', '*.part', '*sample*'])
+partialFiles = set(['*.part', '*.!qB', '*.!ut', '*.crdownload'])
 # rename "Featurettes" to "Extras"
 manga  = Literals("7z", "rar", "zip")
 dir = Literals("")
@@ -68,3 +69,19 @@ postSubstitutions = [
   Substitution(r'(?<=[,\]\)\d] )(%s)' % small.pattern, lambda m: m.group(1).capitalize())   # Simpsons, the (2015) the -> Simpsons, The (2015) The
 ]
 
+extraLiterals = []
+
+def extendLiterals(*extra):
+  from organizer import pipeline
+  global literals
+
+  previous = literals
+  literals = Literals(literals, *extra)
+  extraLiterals.extend(extra)
+
+  for i, s in enumerate(postSubstitutions):
+    if getattr(s.replacement, '__self__', None) is previous:
+      postSubstitutions[i] = Substitution(r'\b(%s)\b' % literals.pattern, literals.convert)
+
+  pipeline.reset()
+
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import logging
+import mmap
+import os
+import stat
+
+logger = logging.getLogger(__name__)
+
+policies = ['skip', 'dedupe', 'suffix']
+
+class DigestCache:
+  def __init__(self, path):
+    import sqlite3
+
+    directory = os.path.dirname(path)
+    if directory != '':
+      os.makedirs(directory, exist_ok=True)
+
+    self.connection = sqlite3.connect(path)
+    self.connection.execute('''CREATE TABLE IF NOT EXISTS digests (
+      device INTEGER NOT NULL, inode INTEGER NOT NULL, mtime INTEGER NOT NULL, size INTEGER NOT NULL,
+      sample BLOB NOT NULL, full BLOB, PRIMARY KEY (device, inode))''')
+
+  def get(self, key):
+    row = self.connection.execute('SELECT mtime, size, sample, full FROM digests WHERE device = ? AND inode = ?', key[:2]).fetchone()
+    # A changed mtime or size means the inode now holds something else
+    if row is None or tuple(row[:2]) != key[2:]:
+      return None, None
+    return row[2], row[3]
+
+  def put(self, key, sample, full):
+    self.connection.execute('INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?, ?, ?)', key + (sample, full))
+
+  def close(self):
+    self.connection.commit()
+    self.connection.close()
+
+class DuplicateDetector:
+  sampleSize = 1 << 16
+  chunkSize = 1 << 20
+
+  def __init__(self, cachePath=None, threads=2):
+    self.cachePath = cachePath
+    self.cache = None
+    self.threads = threads
+    self.executor = None
+
+  def same(self, first, second):
+    # Cheapest checks first: size, then a few sampled blocks, and only then the whole content
+    try:
+      if os.path.samefile(first, second):
+        return True
+
+      stats = [os.stat(first), os.stat(second)]
+    except OSError:
+      return False
+
+    if not all(stat.S_ISREG(s.st_mode) for s in stats) or stats[0].st_size != stats[1].st_size:
+      return False
+
+    keys = [(s.st_dev, s.st_ino, s.st_mtime_ns, s.st_size) for s in stats]
+    cached = [self.lookup(key) for key in keys]
+    samples = [sample or self.sample(path) for path, (sample, full) in zip([first, second], cached)]
+    if samples[0] != samples[1]:
+      self.store(keys, samples, [full for sample, full in cached])
+      return False
+
+    # Small files are fully covered by their samples
+    if stats[0].st_size <= 3 * self.sampleSize:
+      self.store(keys, samples, [full for sample, full in cached])
+      return True
+
+    fulls = [full for sample, full in cached]
+    missing = [i for i, full in enumerate(fulls) if full is None]
+    if missing:
+      if self.executor is None:
+        self.executor = ThreadPoolExecutor(self.threads, thread_name_prefix='digest')
+      futures = {i: self.executor.submit(self.digest, [first, second][i]) for i in missing}
+      for i, future in futures.items():
+        fulls[i] = future.result()
+
+    self.store(keys, samples, fulls)
+    return fulls[0] == fulls[1]
+
+  def sample(self, path):
+    digest = hashlib.blake2b()
+    with open(path, 'rb') as f:
+      size = os.fstat(f.fileno()).st_size
+      if size == 0:
+        return digest.digest()
+
+      with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+        if size <= 3 * self.sampleSize:
+          digest.update(view)
+        else:
+          middle = size // 2 - self.sampleSize // 2
+          for offset in [0, middle, size - self.sampleSize]:
+            digest.update(view[offset:offset + self.sampleSize])
+    return digest.digest()
+
+  def digest(self, path):
+    digest = hashlib.blake2b()
+    buffer = bytearray(self.chunkSize)
+    view = memoryview(buffer)
+    with open(path, 'rb', buffering=0) as f:
+      while True:
+        count = f.readinto(buffer)
+        if not count:
+          break
+        digest.update(view[:count])
+    return digest.digest()
+
+  def lookup(self, key):
+    if self.cachePath and self.cache is None:
+      try:
+        self.cache = DigestCache(self.cachePath)
+      except Exception as e:
+        logger.warning('Unable to open digest cache %s: %s', self.cachePath, e)
+        self.cachePath = None
+
+    return self.cache.get(key) if self.cache else (None, None)
+
+  def store(self, keys, samples, fulls):
+    if self.cache:
+      for key, sample, full in zip(keys, samples, fulls):
+        self.cache.put(key, sample, full)
+
+  def close(self):
+    if self.executor:
+      self.executor.shutdown()
+      self.executor = None
+    if self.cache:
+      self.cache.close()
+      self.cache = None
+
+class CollisionPolicy:
+  def __init__(self, policy, detector, dryRun=False):
+    self.policy = policy
+    self.detector = detector
+    self.dryRun = dryRun
+    self.reserved = {}
+
+  def reserve(self, target, source):
+    # Moves finish in the background, until then the target is held by its source
+    self.reserved[target] = source
+
+  def occupant(self, target):
+    source = self.reserved.get(target)
+    if source is not None and os.path.lexists(source):
+      return source
+    return target if os.path.lexists(target) else None
+
+  def resolve(self, source, target):
+    # Returns where source should go, or None to leave it alone
+    for candidate in self.candidates(source, target):
+      occupant = self.occupant(candidate)
+      if occupant is None or occupant == source or self.samefile(source, occupant):
+        return candidate
+
+      if self.policy != 'skip' and self.detector.same(source, occupant):
+        if self.dryRun:
+          logger.info('Duplicate of %s: %s', candidate, source)
+        else:
+          logger.info('Removing duplicate of %s: %s', candidate, source)
+          os.remove(source)
+        return None
+
+      if self.policy != 'suffix':
+        logger.warning('Skipping, %s already exists: %s', candidate, source)
+        return None
+
+  def candidates(self, source, target):
+    yield target
+
+    stem, extension = (target, '') if os.path.isdir(source) else os.path.splitext(target)
+    number = 2
+    while True:
+      yield '%s (%s)%s' % (stem, number, extension)
+      number += 1
+
+  def samefile(self, first, second):
+    try:
+      return os.path.samefile(first, second)
+    except OSError:
+      return False
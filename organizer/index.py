@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import logging
+import os
+
+from organizer.cache import cacheDirectory
+from organizer.scanner import listDirectory
+
+logger = logging.getLogger(__name__)
+
+def defaultPath(root):
+  digest = hashlib.sha1(os.path.abspath(root).encode('utf-8', 'surrogateescape')).hexdigest()
+  return os.path.join(cacheDirectory, 'index-%s.json' % digest)
+
+class DirectoryIndex:
+  version = 1
+
+  def __init__(self, path, root, fingerprint, full=False):
+    self.path = path
+    self.root = root
+    self.fingerprint = fingerprint
+    self.nodes = {}
+    self.skipped = 0
+    self.tree = {}
+
+    if full:
+      logger.debug('Rebuilding index: %s', path)
+    else:
+      self.load()
+
+  def load(self):
+    try:
+      with open(self.path, encoding='utf-8', errors='surrogateescape') as f:
+        data = json.load(f)
+    except FileNotFoundError:
+      return
+    except (OSError, ValueError) as e:
+      logger.warning('Ignoring unreadable index %s: %s', self.path, e)
+      return
+
+    if data.get('version') != self.version or data.get('fingerprint') != self.fingerprint:
+      logger.debug('Index is out of date, rebuilding: %s', self.path)
+      return
+
+    self.tree = data['tree']
+
+  def save(self):
+    os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+    data = {'version': self.version, 'fingerprint': self.fingerprint, 'tree': self.tree}
+    temporary = self.path + '.tmp'
+    with open(temporary, 'w', encoding='utf-8', errors='surrogateescape') as f:
+      json.dump(data, f, separators=(',', ':'))
+    os.replace(temporary, self.path)
+    logger.debug('Skipped %s unchanged directories', self.skipped)
+
+  def walk(self, purger=None, limit=None):
+    return self.walkNode(self.root, self.tree, purger, limit)
+
+  def walkNode(self, directory, node, purger, limit):
+    try:
+      stat = os.stat(directory)
+    except OSError:
+      return
+
+    # A directory's mtime only changes when its own entries change, so an unchanged and previously
+    # clean directory is not listed again, but its subdirectories still have to be checked
+    if node.get('clean') and node.get('mtime') == stat.st_mtime_ns and node.get('inode') == stat.st_ino:
+      self.skipped += 1
+      for name, child in node['dirs'].items():
+        yield from self.walkNode(os.path.join(directory, name), child, purger, limit)
+      return
+
+    listing = listDirectory(directory, purger.matches if purger else None, limit)
+    if listing is None:
+      return
+
+    previous = node.get('dirs', {})
+    children = {name: previous.get(name, {}) for name in listing.children}
+    node['dirs'] = children
+    node['clean'] = False
+    for name, child in children.items():
+      yield from self.walkNode(os.path.join(directory, name), child, purger, limit)
+
+    if listing.pruned:
+      purger.prune(directory, listing.pruned)
+    self.nodes[directory] = node
+    yield directory, listing.directories, listing.files
+
+  def update(self, directory, renamed, clean):
+    node = self.nodes.pop(directory, None)
+    if node is None:
+      return
+
+    for original, normalized in renamed:
+      if original in node['dirs']:
+        node['dirs'][normalized] = node['dirs'].pop(original)
+
+    try:
+      stat = os.stat(directory)
+    except OSError:
+      return
+
+    node['mtime'] = stat.st_mtime_ns
+    node['inode'] = stat.st_ino
+    node['clean'] = clean
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+
+import errno
+import hashlib
+import json
+import logging
+import os
+
+from organizer.mover import Mover
+
+logger = logging.getLogger(__name__)
+
+class Plan:
+  def __init__(self, path):
+    self.path = path
+    self.count = 0
+    self.file = open(path, 'w', encoding='utf-8')
+
+    # The journal of an earlier plan with the same name would mark these operations done
+    try:
+      os.remove(path + '.journal')
+    except FileNotFoundError:
+      pass
+
+  def add(self, operation, source, target):
+    logger.debug('Planned %s: %s => %s', operation, source, target)
+    self.file.write(json.dumps({'op': operation, 'source': source, 'target': target}) + '\n')
+    self.count += 1
+
+  def close(self):
+    self.file.flush()
+    os.fsync(self.file.fileno())
+    self.file.close()
+    logger.info('Planned %s operations in %s', self.count, self.path)
+
+def read(path):
+  with open(path, encoding='utf-8') as f:
+    return [json.loads(line) for line in f if line.strip()]
+
+def digest(path):
+  with open(path, 'rb') as f:
+    return hashlib.sha1(f.read()).hexdigest()
+
+class Journal:
+  batchSize = 256
+
+  def __init__(self, plan):
+    self.path = plan + '.journal'
+    self.plan = digest(plan)
+    self.states = {}
+    self.unsynced = 0
+    header = None
+    line = ''
+
+    try:
+      with open(self.path, encoding='utf-8') as f:
+        for line in f:
+          try:
+            entry = json.loads(line)
+          except ValueError:
+            # A crash can leave a partially written last line
+            logger.warning('Ignoring truncated journal entry in %s', self.path)
+            continue
+          if 'plan' in entry:
+            header = entry['plan']
+          else:
+            self.states[entry['index']] = entry['state']
+    except FileNotFoundError:
+      line = None
+
+    # The journal starts with the digest of its plan, one written for another plan is started over
+    if header != self.plan:
+      if line is not None:
+        logger.warning('Ignoring journal of a different plan: %s', self.path)
+      self.states = {}
+      self.file = open(self.path, 'w', encoding='utf-8')
+      self.file.write(json.dumps({'plan': self.plan}) + '\n')
+    else:
+      self.file = open(self.path, 'a', encoding='utf-8')
+      if line and not line.endswith('\n'):
+        self.file.write('\n')
+
+  def record(self, index, state):
+    self.states[index] = state
+    self.file.write(json.dumps({'index': index, 'state': state}) + '\n')
+    self.unsynced += 1
+    if self.unsynced >= self.batchSize:
+      self.sync()
+
+  def sync(self):
+    self.file.flush()
+    os.fsync(self.file.fileno())
+    self.unsynced = 0
+
+  def close(self):
+    self.sync()
+    self.file.close()
+
+class Applier:
+  def __init__(self, path):
+    self.path = path
+    self.operations = read(path)
+    self.directories = set()
+    self.mover = Mover()
+
+  def move(self, source, target):
+    directory = os.path.dirname(target)
+    if directory not in self.directories:
+      if directory != '':
+        os.makedirs(directory, exist_ok=True)
+      self.directories.add(directory)
+
+    try:
+      os.rename(source, target)
+    except OSError as e:
+      if e.errno != errno.EXDEV:
+        raise
+      self.mover.move(source, target)
+
+  def done(self, source, target):
+    # Completed before the journal entry reached the disk
+    return not os.path.lexists(source) and os.path.lexists(target)
+
+  def apply(self):
+    journal = Journal(self.path)
+    applied = failed = 0
+
+    try:
+      for index, operation in enumerate(self.operations):
+        if journal.states.get(index) == 'done':
+          continue
+
+        source, target = operation['source'], operation['target']
+        try:
+          if not self.done(source, target):
+            logger.debug('Applying %s: %s => %s', operation['op'], source, target)
+            self.move(source, target)
+          journal.record(index, 'done')
+          applied += 1
+        except OSError as e:
+          logger.error('Unable to %s: %s', operation['op'], e)
+          failed += 1
+    finally:
+      journal.close()
+
+    logger.info('Applied %s of %s operations from %s (%s failed)', applied, len(self.operations), self.path, failed)
+    return failed == 0
+
+  def undo(self):
+    journal = Journal(self.path)
+    undone = failed = 0
+
+    try:
+      for index in reversed(range(len(self.operations))):
+        if journal.states.get(index) != 'done':
+          continue
+
+        operation = self.operations[index]
+        source, target = operation['source'], operation['target']
+        try:
+          if not self.done(target, source):
+            logger.debug('Undoing %s: %s => %s', operation['op'], target, source)
+            self.move(target, source)
+          journal.record(index, 'undone')
+          undone += 1
+        except OSError as e:
+          logger.error('Unable to undo %s: %s', operation['op'], e)
+          failed += 1
+    finally:
+      journal.close()
+
+    logger.info('Undid %s operations from %s (%s failed)', undone, self.path, failed)
+    return failed == 0
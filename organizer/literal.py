@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 
+import json
 import logging
 import re
 
@@ -10,19 +11,35 @@ class Literals:
     self.literals = []
     for literal in literals:
       if isinstance(literal, Literals):
-        self.literals.extend(literal.literals)
+        self.literals.extend(literal.literals.values())
       else:
         self.literals.append(literal)
 
     self.literals = sorted(set(self.literals))
     self.literals = {re.escape(l) : l for l in self.literals}
-    self.pattern = '|'.join(self.literals)
-    self.regex = re.compile(self.pattern, re.IGNORECASE)
-    self.map = {l.lower() : l for l in self.literals}
+    self.pattern = trie(self.literals.values())
+    self.compiled = None
+    self.map = {l.lower() : l for l in self.literals.values()}
+
+  @classmethod
+  def load(cls, path):
+    with open(path, encoding='utf-8') as f:
+      if path.endswith('.json'):
+        literals = json.load(f)
+      else:
+        literals = [line.strip() for line in f if not line.lstrip().startswith('#')]
+
+    return cls(*[literal for literal in literals if literal])
+
+  @property
+  def regex(self):
+    if self.compiled is None:
+      self.compiled = re.compile(self.pattern, re.IGNORECASE)
+    return self.compiled
 
   def matches(self, text):
-    matches = self.regex.pattern != '' and self.regex.match(text) != None
-    logger.debug("Match '%s' and text '%s': %s", self.regex.pattern, text, matches)
+    matches = self.pattern != '' and self.regex.match(text) != None
+    logger.debug("Match '%s' and text '%s': %s", self.pattern, text, matches)
     return matches
 
   def convert(self, m):
@@ -39,3 +56,24 @@ class Literals:
     logger.debug('Literal %s => %s', key, replacement)
     return replacement
 
+def trie(literals):
+  # Share prefixes instead of a flat a|b|c alternation so matching doesn't slow down as lists grow. Like the sorted
+  # alternation, the shortest literal is tried first when one is a prefix of another, e.g. DC before DCP.
+  root = {}
+  for literal in literals:
+    node = root
+    for c in literal:
+      node = node.setdefault(c.lower(), {'': c})
+    node[None] = True
+
+  return expression(root)
+
+def expression(node):
+  branches = [re.escape(child['']) + expression(child) for key, child in node.items() if key]
+  if not branches:
+    return ''
+  if None in node:
+    return '(?:%s)??' % '|'.join(branches)
+  if len(branches) == 1:
+    return branches[0]
+  return '(?:%s)' % '|'.join(branches)
@@ -1,21 +1,119 @@
 import argparse
 import logging
+import os
 import signal
+import sys
+from organizer import config
+from organizer.cache import cacheDirectory, defaultPath as cachePath
 from organizer.cleaner import *
+from organizer.literal import Literals
 
-def main():
-  signal.signal(signal.SIGPIPE, signal.SIG_DFL)
-
+def arguments(argv=None):
   parser = argparse.ArgumentParser(description = 'Normalizes files within a target directory by renaming them to a canonical form and sorting them into an output folder by media type.')
-  parser.add_argument('directory', action='store', default='.', nargs='?', help='The input directory')
+  parser.add_argument('directories', action='store', default=['.'], nargs='*', metavar='directory', help='The input directories. Several directories are split into subtrees cleaned in parallel by --jobs processes')
+  parser.add_argument('-a', '--apply', action='store', default=None, metavar='plan', help='Apply the renames of a plan written by --plan, resuming from its journal after an interruption')
+  parser.add_argument('-c', '--cache', action='store_true', default=False, help='Cache normalized names in a database, skipping names seen in a previous run')
+  parser.add_argument('--cache-file', action='store', default=cachePath, metavar='file', help='The database used by --cache. Default is %s' % cachePath)
+  parser.add_argument('--cache-size', action='store', type=int, default=1000000, metavar='N', help='The maximum number of names kept in the cache. Default is 1000000')
   parser.add_argument('-i', '--interactive', action='store_true', default=False, help='Request permission before renaming or moving a file')
+  parser.add_argument('--incremental', action='store_true', default=False, help='Only visit directories that changed since the previous incremental run')
+  parser.add_argument('--collision', action='store', choices=['skip', 'dedupe', 'suffix'], default='skip', help='What to do when the new name or destination already exists. skip leaves the file alone, dedupe deletes it when its content is identical and skips it otherwise, suffix also deletes identical files and appends a number otherwise. Default is skip')
+  parser.add_argument('--full', action='store_true', default=False, help='Visit every directory and rebuild the index used by --incremental')
+  parser.add_argument('--index', action='store', default=None, metavar='file', help='The index file used by --incremental. Default is a file per input directory in %s' % cacheDirectory)
+  parser.add_argument('--json', action='store_true', default=False, help='Write --stdin results as JSON lines instead of tab separated records')
+  parser.add_argument('-j', '--jobs', action='store', type=int, default=1, metavar='N', help='The number of processes used to normalize filenames. Default is 1')
+  parser.add_argument('-L', '--literals', action='append', default=[], metavar='file', help='Load extra literals, e.g. release groups, show titles or acronyms, whose case is kept as written. A text file with one literal per line or a JSON list. Can be repeated')
   parser.add_argument('-l', '--log', action='store_true', default=False, help='Log output to file')
   parser.add_argument('-m', '--max-length', action='store', type=int,  default=140, metavar='len', help='The maximum filename length. Default is 140 characters')
+  parser.add_argument('--metrics', action='store', default=None, metavar='file', help='Write metrics of the run, such as throughput, renames, errors, phase timings and latency histograms, to a file in the Prometheus text format, e.g. for the node exporter textfile collector')
+  parser.add_argument('--metrics-json', action='store', default=None, metavar='file', help='Write the --metrics of the run as JSON to file')
+  parser.add_argument('--metrics-interval', action='store', type=float, default=60.0, metavar='seconds', help='How often the metrics files are rewritten during long runs such as --watch. Default is 60 seconds')
+  parser.add_argument('--move-jobs', action='store', type=int, default=2, metavar='N', help='The number of concurrent moves per pair of source and destination devices. Default is 2')
+  parser.add_argument('--device-jobs', action='store', type=int, default=2, metavar='N', help='The number of subtrees cleaned at once per device when several directories are given. Default is 2')
   parser.add_argument('-n', '--dry-run', action='store_true', default=False, help='Perform a trial run with no files modified')
-  parser.add_argument('-o', '--output', action='store', default='../organized/', metavar='dir', help='The output directory for the organized files')
+  parser.add_argument('-0', '--null', action='store_true', default=False, help='Names read by --stdin are separated by NUL instead of newline characters, e.g. from find -print0. Records written are NUL terminated too')
+  parser.add_argument('-o', '--output', action='store', default=None, metavar='dir', help='After cleaning, sort the top level files and directories into type folders such as tv, movies and books within this directory, e.g. ../organized/')
+  parser.add_argument('--plan', action='store', default=None, metavar='file', help='Write the renames to a plan file for --apply instead of renaming')
+  parser.add_argument('-p', '--profile', action='store_true', default=False, help='Time every substitution rule, titlecasing and filesystem call and print a ranked report at the end')
+  parser.add_argument('--profile-json', action='store', default=None, metavar='file', help='Write the --profile report as JSON instead')
+  parser.add_argument('--scan-threads', action='store', type=int, default=4, metavar='N', help='The number of threads listing directories ahead of the walk. Raise it for high latency network mounts. Default is 4')
+  parser.add_argument('--purge', action='store_true', default=False, help='Delete junk files and directories such as __MACOSX, .DS_Store and *.url while walking, before names are normalized. Only listed with --dry-run or --plan')
+  parser.add_argument('-r', '--review', action='store_true', default=False, help='List the renames of each directory at once and confirm them with a single answer. Lines can be edited or skipped first, All stops reviewing')
   parser.add_argument('-s', '--semi-interactive', action='store_true', default=False, help='Manually confirm renaming the first file and automatically rename all other files in the same directory. Useful when a directory contains similarly named files. If the first file is edited or skipped, treat the rest of the folder as interactive.')
+  parser.add_argument('--spill', action='store', type=int, default=100000, metavar='N', help='Sort the entries of directories larger than N in temporary files instead of memory. Default is 100000')
+  parser.add_argument('--stdin', action='store_true', default=False, help='Read names or paths from standard input and write the original and normalized name of each to standard output without touching the disk. Paths ending with / are normalized as directories')
+  parser.add_argument('-u', '--undo', action='store', default=None, metavar='plan', help='Revert the renames applied from a plan, newest first')
+  parser.add_argument('-w', '--watch', action='store_true', default=False, help='After cleaning the directory, keep watching it and clean new files and directories once they finish downloading')
+  parser.add_argument('--settle', action='store', type=float, default=0.5, metavar='seconds', help='How long a new file must stay unchanged before --watch cleans it. Default is 0.5 seconds')
+  parser.add_argument('--poll', action='store', type=float, default=None, metavar='seconds', help='Poll for changes every N seconds in --watch mode instead of using inotify, e.g. for network mounts')
   parser.add_argument('-v', '--verbose', action='store_true', default=False, help='Increase the verbosity level')
-  args = parser.parse_args()
+  args = parser.parse_args(argv)
+  args.directory = args.directories[0]
+
+  if args.stdin:
+    conflicts = [option for option, value in [('--apply', args.apply), ('--full', args.full), ('--incremental', args.incremental), ('--interactive', args.interactive),
+      ('--output', args.output), ('--plan', args.plan), ('--purge', args.purge), ('--review', args.review), ('--semi-interactive', args.semi_interactive), ('--undo', args.undo), ('--watch', args.watch)] if value]
+    if conflicts:
+      parser.error('--stdin cannot be combined with %s' % ', '.join(conflicts))
+
+  if len(args.directories) > 1:
+    conflicts = [option for option, value in [('--apply', args.apply), ('--full', args.full), ('--incremental', args.incremental), ('--interactive', args.interactive),
+      ('--plan', args.plan), ('--review', args.review), ('--semi-interactive', args.semi_interactive), ('--stdin', args.stdin), ('--undo', args.undo), ('--watch', args.watch)] if value]
+    if conflicts:
+      parser.error('Several directories cannot be combined with %s' % ', '.join(conflicts))
+
+    roots = [os.path.realpath(directory) for directory in args.directories]
+    for i, root in enumerate(roots):
+      for j in range(i + 1, len(roots)):
+        if os.path.commonpath([root, roots[j]]) in (root, roots[j]):
+          parser.error('%s overlaps %s' % (args.directories[i], args.directories[j]))
+
+  if args.review and (args.interactive or args.semi_interactive):
+    parser.error('--review cannot be combined with --interactive or --semi-interactive')
+
+  if args.index is None and (args.incremental or args.full):
+    from organizer.index import defaultPath
+    args.index = defaultPath(args.directory)
+
+  return args
+
+def configureLogging(args):
+  logfile = "organizer.log"
+  level = logging.DEBUG if args.verbose else logging.INFO
+  logger = logging.getLogger()
+  logger.setLevel(level)
+
+  consoleHandler = logging.StreamHandler(stream=sys.stderr if args.stdin else sys.stdout)
+  logger.addHandler(consoleHandler)
+
+  if args.log:
+    formatter = logging.Formatter("%(asctime)s [%(levelname)s]\t%(message)s")
+    fileHandler = logging.FileHandler(logfile)
+    fileHandler.setFormatter(formatter)
+    logger.addHandler(fileHandler)
+
+def main():
+  signal.signal(signal.SIGPIPE, signal.SIG_DFL)
+
+  args = arguments()
+  configureLogging(args)
+
+  if args.literals:
+    config.extendLiterals(*[Literals.load(path) for path in args.literals])
+  cleaner = FileCleaner(args)
+
+  if args.apply or args.undo:
+    from organizer.journal import Applier
 
-  FileCleaner(args).process()
+  if args.apply:
+    sys.exit(0 if Applier(args.apply).apply() else 1)
+  elif args.undo:
+    sys.exit(0 if Applier(args.undo).undo() else 1)
+  elif args.stdin:
+    cleaner.filter(sys.stdin.buffer, sys.stdout.buffer)
+  elif len(args.directories) > 1:
+    from organizer.shard import Coordinator
+    sys.exit(0 if Coordinator(args).run() else 1)
+  else:
+    cleaner.process(args.watch)
 
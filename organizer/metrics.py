@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+
+from collections import Counter
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+
+from organizer import profile
+
+logger = logging.getLogger(__name__)
+
+# The active Metrics, checked before recording so that runs without metrics pay nothing
+registry = None
+
+counters = {
+  'directories': 'Directories listed by the walk',
+  'files': 'Files listed by the walk',
+  'normalizations': 'Names run through the normalization rules, cache hits excluded',
+  'cache_hits': 'Names found in the normalization cache',
+  'renames': 'Files and directories renamed or added to a plan',
+  'moves': 'Files and directories moved into the output directory',
+  'moved_bytes': 'Bytes copied to another device by moves, renames within a device copy nothing',
+  'errors': 'Errors logged',
+  'truncations': 'Names shortened to the maximum length',
+}
+
+histograms = {
+  'stat': 'Latency of existence checks before a rename or move',
+  'rename': 'Latency of renames',
+  'move': 'Latency of moves, including copies across devices',
+}
+
+phases = ['walk', 'normalize', 'apply']
+
+class Histogram:
+  # Upper bounds in seconds, from a cached local stat to a slow network mount
+  bounds = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+  def __init__(self):
+    self.buckets = [0] * (len(self.bounds) + 1)
+    self.count = 0
+    self.sum = 0.0
+
+  def observe(self, seconds):
+    self.buckets[bisect.bisect_left(self.bounds, seconds)] += 1
+    self.count += 1
+    self.sum += seconds
+
+  def merge(self, other):
+    self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+    self.count += other.count
+    self.sum += other.sum
+
+  def cumulative(self):
+    total = 0
+    for bound, count in zip(self.bounds + (float('inf'),), self.buckets):
+      total += count
+      yield bound, total
+
+  def json(self):
+    return {'count': self.count, 'seconds': self.sum, 'buckets': {'%g' % bound: count for bound, count in self.cumulative()}}
+
+class MetricsHandler(logging.Handler):
+  # Errors and truncations are counted from the log, which also covers the records replayed from worker processes
+  def __init__(self, metrics):
+    super().__init__(logging.WARNING)
+    self.metrics = metrics
+
+  def emit(self, record):
+    if record.levelno >= logging.ERROR:
+      self.metrics.count('errors')
+    metric = getattr(record, 'metric', None)
+    if metric:
+      self.metrics.count(metric)
+
+class Metrics:
+  def __init__(self, prometheus=None, json=None, interval=60.0):
+    self.prometheus = prometheus
+    self.jsonPath = json
+    self.interval = interval
+    self.lock = threading.Lock()
+    self.started = time.time()
+    self.written = time.monotonic()
+    self.counters = Counter()
+    self.histograms = {name: Histogram() for name in histograms}
+    self.phases = Counter()
+
+  def count(self, name, value=1):
+    with self.lock:
+      self.counters[name] += value
+
+  def observe(self, name, seconds):
+    with self.lock:
+      self.histograms[name].observe(seconds)
+
+  def phase(self, name, seconds):
+    with self.lock:
+      self.phases[name] += seconds
+
+  def snapshot(self):
+    # Hands what was recorded so far to another process and starts over
+    with self.lock:
+      snapshot = (self.counters, self.histograms, self.phases)
+      self.counters, self.histograms, self.phases = Counter(), {name: Histogram() for name in histograms}, Counter()
+    return snapshot
+
+  def merge(self, snapshot):
+    counters, histograms, phases = snapshot
+    with self.lock:
+      self.counters.update(counters)
+      self.phases.update(phases)
+      for name, histogram in histograms.items():
+        self.histograms[name].merge(histogram)
+
+  def remaining(self):
+    return max(0, self.written + self.interval - time.monotonic())
+
+  def flush(self):
+    # Long runs rewrite the files every interval, so scrapes see progress before the run ends
+    if self.remaining() == 0:
+      self.write()
+
+  def write(self):
+    self.written = time.monotonic()
+    if self.prometheus:
+      self.save(self.prometheus, self.text())
+    if self.jsonPath:
+      self.save(self.jsonPath, json.dumps(self.json(), indent=2) + '\n')
+
+  def save(self, path, content):
+    # The textfile collector may read at any time, so replace the file instead of rewriting it
+    temporary = '%s.%s.tmp' % (path, os.getpid())
+    try:
+      with open(temporary, 'w') as f:
+        f.write(content)
+      os.replace(temporary, path)
+    except OSError as e:
+      logger.error('Unable to write metrics: %s', e)
+
+  def elapsed(self):
+    return max(time.time() - self.started, 1e-9)
+
+  def json(self):
+    with self.lock:
+      elapsed = self.elapsed()
+      return {
+        'started': self.started,
+        'seconds': elapsed,
+        'counters': {name: self.counters[name] for name in counters},
+        'rates': {name: self.counters[name] / elapsed for name in ['directories', 'files']},
+        'phases': {name: self.phases[name] for name in phases},
+        'histograms': {name: histogram.json() for name, histogram in self.histograms.items()},
+      }
+
+  def text(self):
+    with self.lock:
+      elapsed = self.elapsed()
+      lines = []
+
+      def metric(name, type, help, samples):
+        lines.append('# HELP organizer_%s %s' % (name, help))
+        lines.append('# TYPE organizer_%s %s' % (name, type))
+        lines.extend('organizer_%s%s %s' % (name, labels, value) for labels, value in samples)
+
+      metric('start_time_seconds', 'gauge', 'Start of the run as a Unix timestamp', [('', '%.3f' % self.started)])
+      metric('run_seconds', 'gauge', 'Duration of the run so far', [('', '%.3f' % elapsed)])
+      for name, help in counters.items():
+        metric('%s_total' % name, 'counter', help, [('', self.counters[name])])
+      for name in ['directories', 'files']:
+        metric('%s_per_second' % name, 'gauge', '%s per second over the run' % counters[name], [('', '%.3f' % (self.counters[name] / elapsed))])
+      metric('phase_seconds', 'counter', 'Time spent walking, normalizing and renaming', [('{phase="%s"}' % name, '%.6f' % self.phases[name]) for name in phases])
+
+      for name, help in histograms.items():
+        histogram = self.histograms[name]
+        samples = [('_bucket{le="%s"}' % ('+Inf' if bound == float('inf') else '%g' % bound), count) for bound, count in histogram.cumulative()]
+        samples += [('_sum', '%.6f' % histogram.sum), ('_count', histogram.count)]
+        metric('%s_seconds' % name, 'histogram', help, samples)
+
+      return '\n'.join(lines) + '\n'
+
+def timed(name, function, *args):
+  # Also the call sites timed by --profile
+  metrics = registry
+  if metrics is None:
+    return profile.timed(name, function, *args)
+
+  start = time.perf_counter()
+  try:
+    return profile.timed(name, function, *args)
+  finally:
+    metrics.observe(name, time.perf_counter() - start)
+
+def start(prometheus=None, json=None, interval=60.0):
+  global registry
+  registry = Metrics(prometheus, json, interval)
+  registry.handler = MetricsHandler(registry)
+  logging.getLogger('organizer').addHandler(registry.handler)
+  return registry
+
+def stop():
+  global registry
+  if registry:
+    logging.getLogger('organizer').removeHandler(registry.handler)
+  stopped, registry = registry, None
+  return stopped
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+
+from concurrent.futures import ThreadPoolExecutor
+import errno
+import fcntl
+import logging
+import os
+import shutil
+import threading
+import time
+
+from organizer import metrics
+
+logger = logging.getLogger(__name__)
+
+FICLONE = 0x40049409
+chunkSize = 1 << 30
+
+# Errors meaning a copy strategy is not available for this pair of files rather than a failed copy
+unsupported = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTTY, errno.EBADF, errno.ETXTBSY}
+
+class Mover:
+  def __init__(self, jobs=2):
+    self.jobs = jobs
+    self.lock = threading.Lock()
+    self.devices = {}
+    self.disabled = set()
+    self.executor = None
+    self.futures = []
+    self.files = 0
+    self.bytes = 0
+    self.start = None
+
+  def submit(self, source, target):
+    if self.executor is None:
+      self.executor = ThreadPoolExecutor(self.jobs * 4, thread_name_prefix='mover')
+    self.futures.append(self.executor.submit(self.moveLimited, source, target))
+
+  def moveLimited(self, source, target):
+    try:
+      with self.device(source, target):
+        metrics.timed('move', self.move, source, target)
+        if metrics.registry:
+          metrics.registry.count('moves')
+    except Exception as e:
+      logger.error("Unable to move: %s", e)
+
+  def device(self, source, target):
+    key = (os.lstat(source).st_dev, device(os.path.dirname(target)))
+    with self.lock:
+      try:
+        return self.devices[key]
+      except KeyError:
+        semaphore = self.devices[key] = threading.BoundedSemaphore(self.jobs)
+        return semaphore
+
+  def wait(self):
+    # Every move is waited for, the caller still has caches and plans to write
+    futures, self.futures = self.futures, []
+    for future in futures:
+      try:
+        future.result()
+      except Exception as e:
+        logger.error("Unable to move: %s", e)
+
+    if self.files:
+      elapsed = time.monotonic() - self.start
+      logger.info('Copied %s files, %.1f MB in %.1fs (%.1f MB/s)', self.files, self.bytes / 1e6, elapsed, self.bytes / 1e6 / max(elapsed, 1e-9))
+
+  def close(self):
+    self.wait()
+    if self.executor:
+      self.executor.shutdown()
+      self.executor = None
+
+  def move(self, source, target):
+    directory = os.path.dirname(target)
+    if directory != '':
+      os.makedirs(directory, exist_ok=True)
+
+    try:
+      os.rename(source, target)
+      return
+    except OSError as e:
+      if e.errno != errno.EXDEV:
+        raise
+
+    logger.debug('Copying across devices: %s => %s', source, target)
+    if os.path.isdir(source) and not os.path.islink(source):
+      shutil.copytree(source, target, symlinks=True, copy_function=self.copy)
+      shutil.rmtree(source)
+    else:
+      self.copy(source, target)
+      os.unlink(source)
+
+  def copy(self, source, target):
+    if os.path.islink(source):
+      os.symlink(os.readlink(source), target)
+      return
+
+    if self.start is None:
+      self.start = time.monotonic()
+
+    started = time.monotonic()
+    with open(source, 'rb') as input, open(target, 'wb') as output:
+      size = os.fstat(input.fileno()).st_size
+      method = self.copyData(input.fileno(), output.fileno(), size)
+      copied = os.fstat(output.fileno()).st_size
+
+    if copied != size:
+      os.unlink(target)
+      raise OSError(errno.EIO, 'Copied %s of %s bytes' % (copied, size), source)
+
+    shutil.copystat(source, target)
+    elapsed = time.monotonic() - started
+    logger.debug('Copied %s bytes with %s in %.2fs: %s', size, method, elapsed, target)
+
+    with self.lock:
+      self.files += 1
+      self.bytes += size
+    if metrics.registry:
+      metrics.registry.count('moved_bytes', size)
+
+  def copyData(self, input, output, size):
+    key = (os.fstat(input).st_dev, os.fstat(output).st_dev)
+
+    for method, function in methods:
+      if (method, key) in self.disabled:
+        continue
+      try:
+        function(input, output, size)
+        return method
+      except OSError as e:
+        if e.errno not in unsupported or os.fstat(output).st_size != 0:
+          raise
+        self.disabled.add((method, key))
+
+    with open(input, 'rb', closefd=False) as source, open(output, 'wb', closefd=False) as target:
+      shutil.copyfileobj(source, target, 1 << 20)
+    return 'read/write'
+
+def device(directory):
+  while True:
+    try:
+      return os.stat(directory or '.').st_dev
+    except FileNotFoundError:
+      parent = os.path.dirname(directory)
+      if parent == directory:
+        raise
+      directory = parent
+
+def reflink(input, output, size):
+  fcntl.ioctl(output, FICLONE, input)
+
+def copyFileRange(input, output, size):
+  if not hasattr(os, 'copy_file_range'):
+    raise OSError(errno.ENOSYS, 'copy_file_range is not available')
+
+  offset = 0
+  while offset < size:
+    copied = os.copy_file_range(input, output, min(chunkSize, size - offset), offset, offset)
+    if copied == 0:
+      break
+    offset += copied
+
+def sendfile(input, output, size):
+  offset = 0
+  while offset < size:
+    copied = os.sendfile(output, input, offset, min(chunkSize, size - offset))
+    if copied == 0:
+      break
+    offset += copied
+
+methods = [('reflink', reflink), ('copy_file_range', copyFileRange), ('sendfile', sendfile)]
@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+
+from organizer import cleaner
+from organizer.normalization import *
+
+kinds = {'file': FileNormalization, 'directory': DirectoryNormalization}
+
+def normalize_names(names, kind='file', max_length=140):
+  try:
+    normalization = kinds[kind]
+  except KeyError:
+    raise ValueError('Unknown kind %r, expected one of %s' % (kind, ', '.join(sorted(kinds))))
+
+  for name in names:
+    record = normalization('', name)
+    cleaner.normalize(record, max_length)
+    yield name, record.normalized()
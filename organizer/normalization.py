@@ -5,7 +5,15 @@ import os
 
 logger = logging.getLogger(__name__)
 
+def trim(name, extension):
+  if extension != '' and name.endswith(extension):
+    return os.path.splitext(name)[0]
+  else:
+    return name.strip()
+
 class Normalization:
+  __slots__ = ('directory', 'originalName', 'name', 'extension')
+
   def __init__(self, directory, name):
     self.directory = directory
     self.originalName = name
@@ -18,10 +26,7 @@ class Normalization:
     return self.name
 
   def setName(self, name):
-    if self.extension != '' and name.endswith(self.extension):
-      self.name, ext = os.path.splitext(name)
-    else:
-      self.name = name.strip()
+    self.name = trim(name, self.extension)
 
   def original(self, path=False):
     if path:
@@ -41,11 +46,15 @@ class Normalization:
 
 
 class FileNormalization(Normalization):
+  __slots__ = ()
+
   def __init__(self, directory, name):
     super().__init__(directory, name)
     self.name, self.extension = os.path.splitext(name)
 
 class DirectoryNormalization(Normalization):
+  __slots__ = ()
+
   def __init__(self, directory, name):
     super().__init__(directory, name)
     self.extension = ''
@@ -4,7 +4,13 @@ from collections import Counter
 import logging
 import os
 import re
-import shutil
+
+from organizer import metrics
+from organizer.cache import cacheDirectory
+from organizer.duplicate import CollisionPolicy, DuplicateDetector
+from organizer.mover import Mover
+from organizer.scanner import Scanner
+from organizer.sniff import Sniffer
 
 logger = logging.getLogger(__name__)
 
@@ -17,10 +23,13 @@ video  = ["avi", "mkv", "m4v", "mov", "mp4", "mpeg", "mpg", "ogv", "qt", "rmvb",
 class TypeMapping:
   def __init__(self, destination, extensions, pattern=""):
     self.destination = destination
-    self.extensions = "|".join(sorted(set(extensions)))
+    self.extensionSet = set(extensions)
+    self.extensions = "|".join(sorted(self.extensionSet))
     if pattern != "":
+      self.content = re.compile(pattern, re.I)
       self.pattern = re.compile("^.*%s.*\.(%s)$" % (pattern, self.extensions), re.I)
     else:
+      self.content = None
       self.pattern = re.compile("^.*\.(%s)$" % self.extensions, re.I)
 
   def matches(self, file):
@@ -29,9 +38,55 @@ class TypeMapping:
   def __str__(self):
     return "%s -> %s" % (self.pattern.pattern, self.destination)
 
+class Classifier:
+  def __init__(self, typeMappings, unknownType):
+    self.typeMappings = typeMappings
+    self.unknownType = unknownType
+    self.extensions = {}
+    for mapping in typeMappings:
+      for extension in mapping.extensionSet:
+        self.extensions.setdefault(extension.lower(), []).append(mapping)
+
+  def classify(self, file):
+    stem, dot, extension = file.rpartition('.')
+
+    # Names the case-insensitive patterns could treat differently from str.lower() take the ordered path
+    if '\n' in file or not extension.isascii():
+      return self.match(file)
+
+    if not dot:
+      return self.unknownType
+
+    for mapping in self.extensions.get(extension.lower(), ()):
+      if mapping.content is None or mapping.content.search(stem):
+        return mapping
+
+    return self.unknownType
+
+  def match(self, file):
+    for mapping in self.typeMappings:
+      if mapping.matches(file):
+        return mapping
+
+    return self.unknownType
+
+  def tally(self, files):
+    types = Counter(map(self.classify, files))
+    del types[self.unknownType]
+    return types
+
 class Organizer:
-  def __init__(self):
+  def __init__(self, args, plan=None):
+    self.args = args
+    self.plan = plan
+    self.mover = Mover(args.move_jobs)
+    self.collisions = CollisionPolicy(args.collision, DuplicateDetector(os.path.join(cacheDirectory, 'digests.db')), plan is not None)
+    self.sniffer = Sniffer(os.path.join(cacheDirectory, 'types.db'), args.scan_threads)
     self.output = args.output
+    self.root = args.directory
+    self.visited = []
+    self.tallies = {}
+    self.entries = []
     self.unknownType = TypeMapping("unknown", "")
     self.typeMappings = [
       TypeMapping("books", books),
@@ -44,54 +99,146 @@ class Organizer:
     ]
     for mapping in self.typeMappings:
       logger.debug('Registered Type Mapping: %s', mapping)
+    self.classifier = Classifier(self.typeMappings, self.unknownType)
 
-  def process(self, source = args.directory):
-    files = sorted(os.listdir(source))
-    for file in files:
-      self.processFile(os.path.join(source, file))
-
-  def processFile(self, file):
+  def process(self, source = None):
+    # Sorts without cleaning, directory types are tallied bottom up by the same walk
+    self.root = source or self.args.directory
+    try:
+      for directory, directories, files in Scanner(self.args.scan_threads).walk(self.root):
+        for name in directories:
+          self.visit(directory, os.path.join(directory, name), True)
+        for name in files:
+          self.visit(directory, os.path.join(directory, name), False)
+        self.classify()
+        if directory == self.root:
+          self.finish()
+    finally:
+      self.close()
+
+  def visit(self, directory, path, isDirectory, name=None, original=None):
+    # Entries are classified by their normalized name, even when a dry run leaves the path unchanged
+    self.visited.append((directory, path, isDirectory, name or os.path.basename(path), original or path))
+
+  def classify(self):
+    visited, self.visited = self.visited, []
+
+    # Files of unknown type have their headers read together
+    unknown = set()
+    for directory, path, isDirectory, name, original in visited:
+      if not isDirectory and self.classifier.classify(name) is self.unknownType:
+        unknown.add(self.source(path, original))
+    self.sniffer.sniffAll(sorted(unknown))
+
+    for directory, path, isDirectory, name, original in visited:
+      source = self.source(path, original)
+      if isDirectory:
+        # Subdirectories were walked first, except those skipped by --incremental
+        types = self.tallies.pop(original, None)
+        if types is None:
+          types = self.tallyTree(source)
+        typeMapping = self.mostCommon(types)
+      else:
+        typeMapping = self.sniffedType(source, name) if source in unknown else self.classifier.classify(name)
+        types = Counter() if typeMapping is self.unknownType else Counter([typeMapping])
+
+      self.tallies.setdefault(directory, Counter()).update(types)
+      if directory == self.root:
+        self.entries.append((path, isDirectory, typeMapping, source))
+
+  def source(self, path, original):
+    return original if self.plan else path
+
+  def finish(self):
+    # Everything below the top level entries is clean by now, they're moved as a whole
+    entries, self.entries = self.entries, []
+    self.tallies.clear()
+    output = os.path.realpath(self.output)
+    for path, isDirectory, typeMapping, source in entries:
+      if os.path.realpath(source) != output:
+        self.processFile(path, isDirectory, typeMapping, source)
+
+  def close(self):
+    self.mover.wait()
+    self.collisions.detector.close()
+    self.sniffer.close()
+
+  def processFile(self, file, isDirectory=None, typeMapping=None, source=None):
+    # A planned move starts where the planned rename ends, until the plan is applied the entry is still at source
+    source = source or file
     try:
       logger.debug("Processing: %s", file)
-      if os.path.exists(file):
-        destination = self.getDestination(file)
-        confirm = not args.dry_run
+      if metrics.timed('stat', os.path.exists, source):
+        destination = self.getDestination(file, isDirectory, typeMapping)
+        confirm = not self.args.dry_run
 
-        if args.interactive:
+        if self.args.interactive:
           result = input(r" (Y/N) ").lower()
           confirm = result == 'y' or result == 'yes'
 
-        if confirm:
-          shutil.move(file, os.path.join(destination, os.path.basename(file)))
+        target = self.collisions.resolve(source, os.path.join(destination, os.path.basename(file))) if confirm else None
+        if target is None:
+          return
+
+        self.collisions.reserve(target, source)
+        if self.plan:
+          self.plan.add('move', file, target)
+        else:
+          self.mover.submit(file, target)
     except Exception as e:
       logger.error("Unable to rename: %s", e)
 
-  def getDestination(self, file):
-    if os.path.isdir(file):
-      type = self.directoryType(file)
-    else:
-      type = self.fileType(file)
+  def getDestination(self, file, isDirectory=None, type=None):
+    if type is None:
+      if isDirectory is None:
+        isDirectory = os.path.isdir(file)
+      type = self.directoryType(file) if isDirectory else self.fileType(file)
 
     logger.info('[%-6s] %s', type.destination, os.path.basename(file))
     return os.path.join(self.output, type.destination)
 
   def fileType(self, file):
-    for typeMapping in self.typeMappings:
-      if typeMapping.matches(file):
-        logger.debug("File mapped %s => %s", os.path.basename(file), typeMapping.destination)
-        return typeMapping
+    typeMapping = self.classifier.classify(file)
+    if typeMapping is self.unknownType:
+      typeMapping = self.sniffedType(file)
 
-    return self.unknownType
+    if typeMapping != self.unknownType:
+      logger.debug("File mapped %s => %s", os.path.basename(file), typeMapping.destination)
 
-  def directoryType(self, dir):
+    return typeMapping
+
+  def sniffedType(self, file, name=None):
+    # Extensionless and misnamed files are classified by their content, keeping the name for patterns such as S01E01
+    extension = self.sniffer.sniff(file)
+    if extension is None:
+      return self.unknownType
+    return self.classifier.classify('%s.%s' % (name or file, extension))
+
+  def tally(self, directory, files):
     types = Counter()
+    unknown = []
+    for file in files:
+      typeMapping = self.classifier.classify(file)
+      if typeMapping is self.unknownType:
+        unknown.append(os.path.join(directory, file))
+      else:
+        types[typeMapping] += 1
+
+    self.sniffer.sniffAll(unknown)
+    types.update(self.sniffedType(file) for file in unknown)
+    del types[self.unknownType]
+    return types
+
+  def tallyTree(self, dir):
+    types = Counter()
+    for root, dirs, files in Scanner(self.args.scan_threads).walk(dir):
+      types.update(self.tally(root, files))
+    return types
 
-    for root, dirs, files in os.walk(dir):
-      for file in files:
-        type = self.fileType(file)
-        if type != self.unknownType:
-          types[type] += 1
+  def directoryType(self, dir):
+    return self.mostCommon(self.tallyTree(dir))
 
+  def mostCommon(self, types):
     for key in types:
       logger.debug('Count: %s = %s', key.destination, types[key])
 
@@ -99,4 +246,3 @@ class Organizer:
       return types.most_common(1)[0][0]
     else:
       return self.unknownType
-
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import logging
+import signal
+import time
+
+from organizer import cleaner
+from organizer import config
+from organizer import metrics
+from organizer import profile
+
+logger = logging.getLogger(__name__)
+
+class RecordingHandler(logging.Handler):
+  def __init__(self):
+    super().__init__()
+    self.records = []
+
+  def emit(self, record):
+    # Flatten the message so the record can be pickled back to the parent
+    record.msg = record.getMessage()
+    record.args = None
+    record.exc_info = None
+    self.records.append(record)
+
+_handler = RecordingHandler()
+
+def _initialize(level, profiling, extraLiterals):
+  signal.signal(signal.SIGINT, signal.SIG_IGN)
+  # Forked workers already inherit the loaded word lists
+  if extraLiterals and not config.extraLiterals:
+    config.extendLiterals(*extraLiterals)
+  root = logging.getLogger()
+  root.handlers = [_handler]
+  root.setLevel(level)
+  if profiling:
+    profile.profiler = profile.Profiler()
+
+def _normalize(normalizations, maxLength):
+  results = []
+  for normalization in normalizations:
+    _handler.records = []
+    truncated = cleaner.normalize(normalization, maxLength)
+    results.append((normalization.name, truncated, _handler.records))
+
+  if profile.profiler:
+    stats, profile.profiler.stats = profile.profiler.stats, {}
+    return results, stats
+  return results, None
+
+class NormalizationPool:
+  chunkSize = 256
+
+  def __init__(self, jobs, maxLength, cache=None, profiler=None):
+    self.jobs = jobs
+    self.maxLength = maxLength
+    self.cache = cache
+    self.profiler = profiler
+    self.executor = ProcessPoolExecutor(jobs, initializer=_initialize, initargs=(logging.getLogger().getEffectiveLevel(), profiler is not None, config.extraLiterals))
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
+
+  def close(self):
+    self.executor.shutdown(cancel_futures=True)
+
+  def normalize(self, batches):
+    pending = deque()
+    inflight = 0
+
+    for directory, batch in batches:
+      misses = [n for n in batch if not self.lookup(n)]
+      futures = [self.executor.submit(_normalize, misses[i:i + self.chunkSize], self.maxLength)
+                 for i in range(0, len(misses), self.chunkSize)]
+      pending.append((directory, batch, misses, futures))
+      inflight += len(futures)
+
+      # Empty batches and cache hits submit nothing, so the batches held back are bounded too
+      while pending and (inflight > self.jobs * 4 or len(pending) > self.jobs * 4 or all(future.done() for future in pending[0][3])):
+        inflight -= len(pending[0][3])
+        yield self.collect(*pending.popleft())
+
+    while pending:
+      yield self.collect(*pending.popleft())
+
+  def lookup(self, normalization):
+    if self.cache is None:
+      return False
+
+    name = self.cache.get(normalization, self.maxLength)
+    if name is not None:
+      normalization.name = name
+    return name is not None
+
+  def collect(self, directory, batch, misses, futures):
+    results = []
+    start = time.perf_counter()
+    for future in futures:
+      chunk, stats = future.result()
+      results.extend(chunk)
+      if stats:
+        self.profiler.merge(stats)
+
+    if metrics.registry:
+      metrics.registry.phase('normalize', time.perf_counter() - start)
+      metrics.registry.count('normalizations', len(misses))
+      metrics.registry.count('cache_hits', len(batch) - len(misses) if self.cache else 0)
+
+    # Cache hits were resolved before submission and have nothing to replay
+    records = {}
+    for normalization, (name, truncated, log) in zip(misses, results):
+      normalization.name = name
+      records[id(normalization)] = log
+      if self.cache and not truncated:
+        self.cache.put(normalization, self.maxLength)
+
+    return directory, batch, [records.get(id(normalization), []) for normalization in batch]
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import os
+import time
+
+from organizer import config
+from organizer import profile
+from organizer import substitution
+from organizer.literal import Literals
+
+logger = logging.getLogger(__name__)
+
+class Pipeline:
+  def __init__(self, label, substitutions):
+    self.label = label
+    self.substitutions = list(substitutions)
+    self.steps = {}
+    self.profiled = {}
+
+  def compile(self, extension):
+    # Extension gated rules (e.g. manga volumes) are resolved once per extension instead of once per rule and file
+    if len(self.steps) > 1024:
+      self.steps.clear()
+
+    steps = tuple((s, s.pattern.sub, s.replacement) for s in self.substitutions
+                  if s.ext is None or (s.ext.pattern != '' and s.ext.regex.match(extension[1:])))
+    self.steps[extension] = steps
+    return steps
+
+  def run(self, name, extension):
+    try:
+      steps = self.steps[extension]
+    except KeyError:
+      steps = self.compile(extension)
+
+    if profile.profiler:
+      return self.profile(profile.profiler, steps, name, extension)
+
+    if substitution.logger.isEnabledFor(logging.DEBUG):
+      return self.trace(steps, name, extension)
+
+    # Inlined equivalent of Normalization.setName after every rule
+    if extension:
+      splitext = os.path.splitext
+      for s, sub, replacement in steps:
+        name = sub(replacement, name)
+        name = splitext(name)[0] if name.endswith(extension) else name.strip()
+    else:
+      for s, sub, replacement in steps:
+        name = sub(replacement, name).strip()
+
+    return name
+
+  def trace(self, steps, name, extension):
+    for s, sub, replacement in steps:
+      name = sub(replacement, name)
+      substitution.logger.debug('%s => %s', s, name)
+      if extension and name.endswith(extension):
+        name = os.path.splitext(name)[0]
+      else:
+        name = name.strip()
+
+    return name
+
+  def profile(self, profiler, steps, name, extension):
+    for s, stat, subn, replacement in self.instrument(profiler, steps):
+      inner = profiler.inner()
+      start = time.perf_counter_ns()
+      name, count = subn(replacement, name)
+      if extension and name.endswith(extension):
+        name = os.path.splitext(name)[0]
+      else:
+        name = name.strip()
+      # Literals.convert has its own line, the rule only keeps the rest
+      stat.add(time.perf_counter_ns() - start - (profiler.inner() - inner), count > 0)
+
+    return name
+
+  def instrument(self, profiler, steps):
+    if self.profiled.get(None) is not profiler:
+      self.profiled = {None: profiler}
+
+    try:
+      return self.profiled[steps]
+    except KeyError:
+      instrumented = []
+      for s, sub, replacement in steps:
+        stat = profiler.stat('%s %02d %s' % (self.label, self.substitutions.index(s), s.pattern.pattern))
+        if isinstance(getattr(replacement, '__self__', None), Literals):
+          replacement = profiler.timed('Literals.convert %s' % literalsName(replacement.__self__), replacement)
+        instrumented.append((s, stat, s.pattern.subn, replacement))
+
+      instrumented = self.profiled[steps] = tuple(instrumented)
+      return instrumented
+
+def literalsName(literals):
+  for key, value in vars(config).items():
+    if value is literals:
+      return key
+  return literals.pattern[:40]
+
+_pipelines = None
+
+def pipelines():
+  global _pipelines
+  if _pipelines is None:
+    _pipelines = (Pipeline('pre', config.preSubstitutions), Pipeline('post', config.postSubstitutions))
+  return _pipelines
+
+def reset():
+  global _pipelines
+  _pipelines = None
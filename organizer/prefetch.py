@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+class Prefetcher:
+  # Runs an iterator in a background thread, up to size items ahead of the consumer
+  end = object()
+
+  def __init__(self, iterable, size=8):
+    self.iterator = iter(iterable)
+    self.items = queue.Queue(size)
+    self.stopped = threading.Event()
+    self.thread = threading.Thread(target=self.run, name='prefetch', daemon=True)
+    self.thread.start()
+
+  def run(self):
+    try:
+      for item in self.iterator:
+        if not self.put((item, None)):
+          return
+      self.put((self.end, None))
+    except BaseException as e:
+      self.put((None, e))
+    finally:
+      # Generators are closed by the thread running them
+      close = getattr(self.iterator, 'close', None)
+      if close:
+        close()
+
+  def put(self, item):
+    while not self.stopped.is_set():
+      try:
+        self.items.put(item, timeout=0.1)
+        return True
+      except queue.Full:
+        pass
+    return False
+
+  def __iter__(self):
+    try:
+      while True:
+        item, error = self.items.get()
+        if error is not None:
+          raise error
+        if item is self.end:
+          return
+        yield item
+    finally:
+      self.close()
+
+  def close(self):
+    self.stopped.set()
+    self.thread.join()
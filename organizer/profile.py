@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+
+from collections import Counter
+import functools
+import json
+import logging
+import math
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# The active Profiler, checked once per name so that profiling costs nothing when disabled
+profiler = None
+
+class Stat:
+  resolution = 8
+
+  def __init__(self):
+    self.calls = 0
+    self.hits = 0
+    self.total = 0
+    self.buckets = Counter()
+    # Filesystem calls are timed from the scanner, sniffer and mover threads too
+    self.lock = threading.Lock()
+
+  def __getstate__(self):
+    state = self.__dict__.copy()
+    del state['lock']
+    return state
+
+  def __setstate__(self, state):
+    self.__dict__.update(state)
+    self.lock = threading.Lock()
+
+  def add(self, elapsed, hit=True):
+    with self.lock:
+      self.calls += 1
+      self.hits += hit
+      self.total += elapsed
+      self.buckets[int(math.log2(elapsed) * self.resolution) if elapsed > 0 else 0] += 1
+
+  def merge(self, other):
+    with self.lock:
+      self.calls += other.calls
+      self.hits += other.hits
+      self.total += other.total
+      self.buckets.update(other.buckets)
+
+  def percentile(self, fraction):
+    remaining = self.calls * (1 - fraction)
+    for bucket in sorted(self.buckets, reverse=True):
+      remaining -= self.buckets[bucket]
+      if remaining < 0:
+        return 2 ** ((bucket + 1) / self.resolution)
+    return 0
+
+  def json(self):
+    return {'calls': self.calls, 'hits': self.hits, 'seconds': self.total / 1e9, 'p99': self.percentile(0.99) / 1e9}
+
+class Profiler:
+  def __init__(self):
+    self.stats = {}
+    self.lock = threading.Lock()
+    self.local = threading.local()
+
+  def stat(self, key):
+    try:
+      return self.stats[key]
+    except KeyError:
+      with self.lock:
+        return self.stats.setdefault(key, Stat())
+
+  def inner(self):
+    # Time spent in timed calls of this thread, which the caller leaves out of its own
+    return getattr(self.local, 'inner', 0)
+
+  def merge(self, stats):
+    for key, stat in stats.items():
+      self.stat(key).merge(stat)
+
+  def call(self, key, function, *args, **kwargs):
+    # Only the outermost timed call is counted, e.g. a listing made while moving, so no time is counted twice
+    local = self.local
+    if getattr(local, 'active', False):
+      return function(*args, **kwargs)
+
+    local.active = True
+    start = time.perf_counter_ns()
+    try:
+      return function(*args, **kwargs)
+    finally:
+      elapsed = time.perf_counter_ns() - start
+      local.active = False
+      local.inner = getattr(local, 'inner', 0) + elapsed
+      self.stat(key).add(elapsed)
+
+  def timed(self, key, function):
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+      return self.call(key, function, *args, **kwargs)
+
+    return wrapper
+
+  def report(self):
+    total = sum(stat.total for stat in self.stats.values())
+    logger.info('%10s %7s %10s %7s %10s %10s  %s', 'calls', 'hits', 'total ms', 'share', 'mean us', 'p99 us', 'name')
+    for key, stat in sorted(self.stats.items(), key=lambda item: item[1].total, reverse=True):
+      if stat.calls == 0:
+        continue
+      logger.info('%10d %6.1f%% %10.1f %6.1f%% %10.1f %10.1f  %s', stat.calls, 100.0 * stat.hits / stat.calls, stat.total / 1e6,
+                  100.0 * stat.total / total if total else 0, stat.total / stat.calls / 1e3, stat.percentile(0.99) / 1e3, key)
+
+  def write(self, path):
+    with open(path, 'w') as f:
+      json.dump({key: stat.json() for key, stat in self.stats.items() if stat.calls > 0}, f, indent=2)
+
+def timed(key, function, *args):
+  # Filesystem calls are timed where the organizer makes them, the os module itself is left alone
+  active = profiler
+  if active is None:
+    return function(*args)
+  return active.call(key, function, *args)
+
+def start():
+  global profiler
+  profiler = Profiler()
+  return profiler
+
+def stop():
+  global profiler
+  stopped, profiler = profiler, None
+  return stopped
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+
+from concurrent.futures import ThreadPoolExecutor
+import fnmatch
+import logging
+import os
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+class Purger:
+  def __init__(self, patterns, dryRun=False, interactive=False, threads=4):
+    # One regex for every glob instead of an fnmatch call per pattern and name
+    self.matcher = re.compile('|'.join(fnmatch.translate(pattern) for pattern in sorted(patterns))) if patterns else None
+    self.dryRun = dryRun
+    self.interactive = interactive
+    self.threads = threads
+    self.executor = None
+    self.pruned = {}
+    self.lock = threading.Lock()
+    self.files = 0
+    self.directories = 0
+    self.bytes = 0
+
+  def matches(self, name):
+    return self.matcher is not None and self.matcher.match(name) is not None
+
+  def prune(self, directory, entries):
+    # Called by the walk, the entries are deleted when the directory itself is cleaned
+    self.pruned[directory] = entries
+
+  def purge(self, directory, entries=None):
+    if entries is None:
+      entries = self.pruned.pop(directory, ())
+
+    for name, isDirectory in entries:
+      path = os.path.join(directory, name)
+      logger.info('Deleting: %s', path)
+
+      if self.interactive:
+        result = input(r"Delete %s? (Yes/No) " % ('directory' if isDirectory else 'file')).lower()
+        if result != 'y' and result != 'yes':
+          continue
+
+      if isDirectory:
+        self.removeDirectory(directory, name)
+      else:
+        self.removeFile(path)
+
+  def removeFile(self, path):
+    try:
+      size = os.lstat(path).st_size
+      if not self.dryRun:
+        os.unlink(path)
+    except OSError as e:
+      logger.error('Unable to delete: %s', e)
+      return
+
+    self.count(1, 0, size)
+
+  def removeDirectory(self, directory, name):
+    # Trees like __MACOSX are removed in the background while the walk goes on. They are opened relative to
+    # their parent, which keeps them reachable after the parent itself is renamed.
+    if self.executor is None:
+      self.executor = ThreadPoolExecutor(self.threads, thread_name_prefix='purge')
+
+    try:
+      parent = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    except OSError as e:
+      logger.error('Unable to delete: %s', e)
+      return
+
+    self.executor.submit(self.removeTree, parent, name, os.path.join(directory, name))
+
+  def removeTree(self, parent, name, path):
+    try:
+      self.count(*self.remove(parent, name))
+    except OSError as e:
+      logger.error('Unable to delete %s: %s', path, e)
+    finally:
+      os.close(parent)
+
+  def remove(self, parent, name):
+    files = directories = size = 0
+    fd = os.open(name, os.O_RDONLY | os.O_DIRECTORY | os.O_NOFOLLOW, dir_fd=parent)
+    try:
+      with os.scandir(fd) as entries:
+        entries = list(entries)
+
+      for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+          counts = self.remove(fd, entry.name)
+          files, directories, size = files + counts[0], directories + counts[1], size + counts[2]
+        else:
+          size += entry.stat(follow_symlinks=False).st_size
+          files += 1
+          if not self.dryRun:
+            os.unlink(entry.name, dir_fd=fd)
+    finally:
+      os.close(fd)
+
+    if not self.dryRun:
+      os.rmdir(name, dir_fd=parent)
+    return files, directories + 1, size
+
+  def count(self, files, directories, size):
+    with self.lock:
+      self.files += files
+      self.directories += directories
+      self.bytes += size
+
+  def wait(self):
+    if self.executor:
+      self.executor.shutdown()
+      self.executor = None
+
+  def close(self, summary=True):
+    self.wait()
+    if summary:
+      self.report()
+
+  def report(self):
+    if self.files or self.directories:
+      logger.info('%s %s files and %s directories, %.1f MB', 'Would delete' if self.dryRun else 'Deleted',
+                  self.files, self.directories, self.bytes / 1e6)
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+
+from concurrent.futures import ThreadPoolExecutor
+import heapq
+import logging
+import os
+import tempfile
+import threading
+
+from organizer import profile
+
+logger = logging.getLogger(__name__)
+
+class Listing:
+  __slots__ = ('directories', 'files', 'children', 'pruned')
+
+  def __init__(self, directories, files, children, pruned=None):
+    self.directories = directories
+    self.files = files
+    self.children = children
+    self.pruned = pruned
+
+class SortedSpill:
+  # Collects names and yields them sorted. Above limit names, sorted runs are written to temporary files and
+  # merged when read, so a directory with millions of entries isn't held in memory.
+  blockSize = 1 << 16
+
+  def __init__(self, limit=None):
+    self.limit = limit
+    self.names = []
+    self.runs = []
+    self.size = 0
+
+  def __len__(self):
+    return self.size
+
+  def append(self, name):
+    self.names.append(name)
+    self.size += 1
+    if self.limit and len(self.names) >= self.limit:
+      self.spill()
+
+  def spill(self):
+    self.names.sort()
+    run = tempfile.TemporaryFile(prefix='organizer-')
+    run.write(b''.join(os.fsencode(name) + b'\0' for name in self.names))
+    run.flush()
+    self.runs.append(run)
+    self.names = []
+
+  def sorted(self):
+    self.names.sort()
+    if not self.runs:
+      return self.names
+    logger.debug('Merging %s sorted runs', len(self.runs) + 1)
+    return self
+
+  def __iter__(self):
+    return heapq.merge(*[self.read(run) for run in self.runs], self.names)
+
+  def read(self, run):
+    # pread keeps every iteration independent of the others
+    offset = 0
+    pending = b''
+    while True:
+      block = os.pread(run.fileno(), self.blockSize, offset)
+      if not block:
+        return
+      offset += len(block)
+      names = (pending + block).split(b'\0')
+      pending = names.pop()
+      for name in names:
+        yield os.fsdecode(name)
+
+def listDirectory(directory, prune=None, limit=None):
+  return profile.timed('list', scanDirectory, directory, prune, limit)
+
+def scanDirectory(directory, prune, limit):
+  directories = SortedSpill(limit)
+  files = SortedSpill(limit)
+  children = SortedSpill(limit)
+  pruned = []
+
+  try:
+    with os.scandir(directory) as entries:
+      for entry in entries:
+        try:
+          isDirectory = entry.is_dir()
+        except OSError:
+          isDirectory = False
+
+        # Pruned entries are neither listed nor descended into
+        if prune and prune(entry.name):
+          pruned.append((entry.name, isDirectory and not entry.is_symlink()))
+        elif isDirectory:
+          directories.append(entry.name)
+          # Like os.walk, symbolic links to directories are listed but not followed
+          if not entry.is_symlink():
+            children.append(entry.name)
+        else:
+          files.append(entry.name)
+  except OSError as e:
+    logger.debug('Unable to list %s: %s', directory, e)
+    return None
+
+  pruned.sort()
+  return Listing(directories.sorted(), files.sorted(), children.sorted(), pruned)
+
+class Scanner:
+  def __init__(self, threads=1, inflight=None, purger=None, limit=None):
+    self.threads = threads
+    self.inflight = inflight or threads * 64
+    self.purger = purger
+    self.limit = limit
+
+  def walk(self, top):
+    if self.threads > 1:
+      with ThreadPoolExecutor(self.threads, thread_name_prefix='scanner') as executor:
+        yield from Walk(self, executor).walk(top)
+    else:
+      yield from Walk(self, None).walk(top)
+
+class Walk:
+  def __init__(self, scanner, executor):
+    self.scanner = scanner
+    self.executor = executor
+    self.futures = {}
+    self.pending = []
+    self.lock = threading.RLock()
+    self.closed = False
+
+  def expand(self, key, directory, listing):
+    # Directories are prefetched in the order the walk reaches them, which is the sort order of their path components.
+    # Children spilled to disk are listed when the walk reaches them instead.
+    if listing is not None and self.executor and isinstance(listing.children, list):
+      with self.lock:
+        for name in listing.children:
+          heapq.heappush(self.pending, (key + (name,), os.path.join(directory, name)))
+        self.prefetch()
+    return listing
+
+  def list(self, key, directory):
+    return self.expand(key, directory, listDirectory(directory, self.scanner.purger.matches if self.scanner.purger else None, self.scanner.limit))
+
+  def prefetch(self):
+    while self.pending and len(self.futures) < self.scanner.inflight and not self.closed:
+      key, directory = heapq.heappop(self.pending)
+      self.futures[directory] = self.executor.submit(self.list, key, directory)
+
+  def result(self, key, directory):
+    with self.lock:
+      future = self.futures.pop(directory, None)
+      if future is None and self.pending and self.pending[0][1] == directory:
+        heapq.heappop(self.pending)
+
+    if future is None:
+      return self.list(key, directory)
+
+    listing = future.result()
+    with self.lock:
+      self.prefetch()
+    return listing
+
+  def walk(self, top):
+    listing = self.result((), top)
+    if listing is None:
+      return
+
+    stack = [((), top, listing, iter(listing.children))]
+    try:
+      while stack:
+        key, directory, listing, children = stack[-1]
+        child = next(children, None)
+
+        if child is None:
+          stack.pop()
+          if listing.pruned:
+            self.scanner.purger.prune(directory, listing.pruned)
+          yield directory, listing.directories, listing.files
+          continue
+
+        path = os.path.join(directory, child)
+        childListing = self.result(key + (child,), path)
+        if childListing is not None:
+          stack.append((key + (child,), path, childListing, iter(childListing.children)))
+    finally:
+      with self.lock:
+        self.closed = True
+        for future in self.futures.values():
+          future.cancel()
@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+
+from collections import Counter, deque
+import argparse
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import time
+
+from organizer import config
+from organizer import metrics
+from organizer import profile
+from organizer.parallel import RecordingHandler
+from organizer.purge import Purger
+from organizer.scanner import listDirectory
+
+logger = logging.getLogger(__name__)
+
+class Shard:
+  __slots__ = ('id', 'root', 'directory', 'recursive', 'device', 'parent', 'remaining')
+
+  def __init__(self, id, root, directory, device, parent=None):
+    self.id = id
+    self.root = root
+    self.directory = directory
+    self.recursive = True
+    self.device = device
+    self.parent = parent
+    self.remaining = 0
+
+class ShardQueue:
+  # Hands out ready shards round robin across devices, with at most deviceJobs shards of a device and jobs shards in total
+  # in flight. A split directory becomes ready once every shard below it is done, so renames still happen bottom up.
+  def __init__(self, jobs, deviceJobs):
+    self.jobs = jobs
+    self.deviceJobs = deviceJobs
+    self.ready = {}
+    self.devices = deque()
+    self.inflight = Counter()
+    self.running = 0
+
+  def __bool__(self):
+    return self.running > 0 or any(self.ready.values())
+
+  def push(self, shard):
+    if shard.device not in self.ready:
+      self.ready[shard.device] = deque()
+      self.devices.append(shard.device)
+    self.ready[shard.device].append(shard)
+
+  def pop(self):
+    if self.running >= self.jobs:
+      return None
+
+    for _ in range(len(self.devices)):
+      device = self.devices[0]
+      self.devices.rotate(-1)
+      if self.ready[device] and self.inflight[device] < self.deviceJobs:
+        self.inflight[device] += 1
+        self.running += 1
+        return self.ready[device].popleft()
+    return None
+
+  def done(self, shard):
+    self.inflight[shard.device] -= 1
+    self.running -= 1
+
+    parent = shard.parent
+    if parent is not None:
+      parent.remaining -= 1
+      if parent.remaining == 0:
+        self.push(parent)
+
+def _work(args, level, extraLiterals, measure, tasks, results):
+  signal.signal(signal.SIGINT, signal.SIG_IGN)
+  if extraLiterals and not config.extraLiterals:
+    config.extendLiterals(*extraLiterals)
+
+  handler = RecordingHandler()
+  root = logging.getLogger()
+  root.handlers = [handler]
+  root.setLevel(level)
+
+  # Metrics are recorded here and written by the coordinator
+  if measure:
+    metrics.start()
+
+  from organizer.cleaner import FileCleaner
+  cleaner = FileCleaner(args)
+  cleaner.open()
+  try:
+    for id, root, directory, recursive in iter(tasks.get, None):
+      handler.records = []
+      # Subtrees cleaned by other workers are tallied again when their top level directory is sorted
+      if cleaner.organizer:
+        cleaner.organizer.root = root
+      cleaner.counts = Counter()
+      start = time.monotonic()
+      try:
+        cleaner.cleanAll(cleaner.batches(directory, recursive))
+      except Exception as e:
+        logger.error('Unable to clean %s: %s', directory, e)
+        cleaner.counts['failed'] += 1
+      results.put(('shard', id, handler.records, cleaner.counts, time.monotonic() - start, metrics.registry.snapshot() if measure else None))
+  finally:
+    # The coordinator merges the summaries of every worker
+    handler.records = []
+    stats = profile.profiler.stats if profile.profiler else None
+    purger = cleaner.purger
+    cleaner.close(False)
+    results.put(('closed', handler.records, (purger.files, purger.directories, purger.bytes) if purger else None, stats, metrics.registry.snapshot() if measure else None))
+
+class Coordinator:
+  # Shards per worker before splitting stops, so that a few large subtrees don't leave the other workers idle
+  split = 4
+
+  def __init__(self, args):
+    self.args = args
+    self.roots = args.directories
+    self.jobs = max(args.jobs, 1)
+    self.queue = ShardQueue(self.jobs, args.device_jobs)
+    self.purger = Purger(config.deleteFiles if args.purge else None, args.dry_run)
+    self.shards = {}
+    self.counts = {root: Counter() for root in self.roots}
+    self.profiler = profile.Profiler() if args.profile or args.profile_json else None
+    self.metrics = metrics.Metrics(args.metrics, args.metrics_json, args.metrics_interval) if args.metrics or args.metrics_json else None
+    self.interrupted = False
+
+  def shard(self, root, directory, parent=None):
+    try:
+      device = os.stat(directory).st_dev
+    except OSError:
+      device = None
+
+    shard = self.shards[len(self.shards)] = Shard(len(self.shards), root, directory, device, parent)
+    if parent is not None:
+      parent.remaining += 1
+    return shard
+
+  def plan(self):
+    # Every root is split into its top level subtrees, which are split further breadth first while there are fewer shards than
+    # workers can share. A split directory's own entries are cleaned after its subtrees, as a shard of its own.
+    leaves = deque(self.shard(root, root) for root in self.roots)
+    unsplit = []
+    while leaves and (leaves[0].parent is None or len(leaves) + len(unsplit) < self.jobs * self.split):
+      shard = leaves.popleft()
+      listing = listDirectory(shard.directory, self.purger.matches, self.args.spill)
+      if not listing or not listing.children:
+        unsplit.append(shard)
+        continue
+
+      shard.recursive = False
+      for name in listing.children:
+        leaves.append(self.shard(shard.root, os.path.join(shard.directory, name), shard))
+
+    for shard in unsplit + list(leaves):
+      self.queue.push(shard)
+    logger.debug('Split %s directories into %s shards', len(self.roots), len(self.shards))
+
+  def run(self):
+    start = time.monotonic()
+    self.plan()
+
+    # Workers clean a shard at a time with a single process each
+    args = argparse.Namespace(**vars(self.args))
+    args.jobs = 1
+    args.metrics = args.metrics_json = None
+    context = multiprocessing.get_context()
+    tasks = context.Queue()
+    results = context.Queue()
+    workers = [context.Process(target=_work, args=(args, logging.getLogger().getEffectiveLevel(), config.extraLiterals, self.metrics is not None, tasks, results), daemon=True)
+               for _ in range(self.jobs)]
+    for worker in workers:
+      worker.start()
+
+    succeeded = True
+    try:
+      self.dispatch(tasks)
+      while (self.queue.running if self.interrupted else self.queue) and succeeded:
+        try:
+          self.collect(results.get(timeout=1))
+          self.dispatch(tasks)
+        except queue.Empty:
+          succeeded = self.alive(workers)
+        except KeyboardInterrupt:
+          # Shards already started are finished, a second interrupt abandons them
+          if self.interrupted:
+            raise
+          logger.info('Interrupted, waiting for %s directories in progress', self.queue.running)
+          self.interrupted = True
+
+      for worker in workers:
+        tasks.put(None)
+
+      closed = 0
+      while closed < len(workers) and succeeded:
+        try:
+          closed += self.collect(results.get(timeout=1))
+        except queue.Empty:
+          succeeded = self.alive(workers)
+    except BaseException:
+      succeeded = False
+      raise
+    finally:
+      for worker in workers:
+        if not succeeded:
+          worker.terminate()
+        worker.join()
+
+    self.report(time.monotonic() - start)
+    return succeeded and not self.interrupted and not sum(counts['failed'] for counts in self.counts.values())
+
+  def dispatch(self, tasks):
+    while not self.interrupted:
+      shard = self.queue.pop()
+      if shard is None:
+        return
+      tasks.put((shard.id, shard.root, shard.directory, shard.recursive))
+
+  def alive(self, workers):
+    for worker in workers:
+      if worker.exitcode not in (None, 0):
+        logger.error('Worker %s exited with code %s', worker.pid, worker.exitcode)
+        return False
+    return True
+
+  def collect(self, message):
+    if message[0] == 'shard':
+      _, id, records, counts, elapsed, snapshot = message
+      shard = self.shards[id]
+      self.replay(records)
+      self.counts[shard.root].update(counts)
+      self.measure(snapshot)
+      logger.debug('Cleaned %s%s in %.2f seconds', shard.directory, '' if shard.recursive else ' without subdirectories', elapsed)
+      self.queue.done(shard)
+      return 0
+
+    _, records, purged, stats, snapshot = message
+    self.replay(records)
+    self.measure(snapshot)
+    if purged:
+      self.purger.count(*purged)
+    if stats:
+      self.profiler.merge(stats)
+    return 1
+
+  def measure(self, snapshot):
+    if snapshot:
+      self.metrics.merge(snapshot)
+      self.metrics.flush()
+
+  def replay(self, records):
+    for record in records:
+      logging.getLogger(record.name).handle(record)
+
+  def report(self, elapsed):
+    for root in self.roots:
+      counts = self.counts[root]
+      logger.info('%s: %s directories, %s names, %s changed, %s renamed, %s failed', root, counts['directories'], counts['names'],
+                  counts['changed'], counts['renamed'], counts['failed'])
+    logger.info('Cleaned %s directories as %s shards with %s processes in %.1f seconds', len(self.roots), len(self.shards), self.jobs, elapsed)
+
+    self.purger.report()
+    if self.metrics:
+      self.metrics.write()
+    if self.profiler:
+      if self.args.profile_json:
+        self.profiler.write(self.args.profile_json)
+      else:
+        self.profiler.report()
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+
+from concurrent.futures import ThreadPoolExecutor
+import fnmatch
+import logging
+import os
+import stat
+
+from organizer import config
+
+logger = logging.getLogger(__name__)
+
+# Every signature below is found within the first few bytes, a single read of one page covers them
+headerSize = 4096
+
+# MP4 major brands of other file types, anything else with an ftyp box is treated as video
+brands = {b'qt  ': 'mov', b'M4A ': 'm4a', b'M4B ': 'm4a', b'M4P ': 'm4p', b'M4V ': 'm4v', b'M4VH': 'm4v', b'M4VP': 'm4v',
+          b'heic': None, b'heix': None, b'mif1': None, b'msf1': None, b'avif': None, b'avis': None}
+
+def sniff(header):
+  if header.startswith(b'\x1a\x45\xdf\xa3'):
+    # EBML, the DocType element tells Matroska from WebM
+    return 'webm' if b'\x42\x82\x84webm' in header[:64] else 'mkv'
+
+  if header[4:8] == b'ftyp':
+    return brands.get(header[8:12], 'mp4')
+
+  if header.startswith(b'Rar!\x1a\x07'):
+    return 'rar'
+
+  if header.startswith(b'7z\xbc\xaf\x27\x1c'):
+    return '7z'
+
+  if header.startswith(b'PK\x03\x04'):
+    # An EPUB starts with an uncompressed mimetype entry
+    nameLength = int.from_bytes(header[26:28], 'little')
+    extraLength = int.from_bytes(header[28:30], 'little')
+    start = 30 + nameLength + extraLength
+    if header[30:30 + nameLength] == b'mimetype' and header[start:start + 20] == b'application/epub+zip':
+      return 'epub'
+    return 'zip'
+
+  if header.startswith(b'%PDF-'):
+    return 'pdf'
+
+  if header.startswith(b'fLaC'):
+    return 'flac'
+
+  if header.startswith(b'ID3') and len(header) >= 10:
+    # The tag size is stored in 7 bit bytes, FLAC files may be tagged too
+    size = 10 + sum((byte & 0x7f) << (7 * (3 - i)) for i, byte in enumerate(header[6:10]))
+    return 'flac' if header[size:size + 4] == b'fLaC' else 'mp3'
+
+  return None
+
+class VerdictCache:
+  def __init__(self, path):
+    import sqlite3
+
+    directory = os.path.dirname(path)
+    if directory != '':
+      os.makedirs(directory, exist_ok=True)
+
+    self.connection = sqlite3.connect(path)
+    self.connection.execute('''CREATE TABLE IF NOT EXISTS verdicts (
+      device INTEGER NOT NULL, inode INTEGER NOT NULL, mtime INTEGER NOT NULL, size INTEGER NOT NULL,
+      extension TEXT, PRIMARY KEY (device, inode))''')
+
+  def get(self, key):
+    row = self.connection.execute('SELECT mtime, size, extension FROM verdicts WHERE device = ? AND inode = ?', key[:2]).fetchone()
+    # A changed mtime or size means the inode now holds something else
+    if row is None or tuple(row[:2]) != key[2:]:
+      return False, None
+    return True, row[2]
+
+  def put(self, key, extension):
+    self.connection.execute('INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?, ?, ?)', key + (extension,))
+
+  def close(self):
+    self.connection.commit()
+    self.connection.close()
+
+class Sniffer:
+  def __init__(self, cachePath=None, threads=4):
+    self.cachePath = cachePath
+    self.cache = None
+    self.threads = threads
+    self.executor = None
+    self.verdicts = {}
+
+  def sniff(self, path):
+    if path not in self.verdicts:
+      self.sniffAll([path])
+    return self.verdicts.get(path)
+
+  def sniffAll(self, paths):
+    paths = [path for path in paths if path not in self.verdicts and not self.ignored(os.path.basename(path))]
+    if not paths:
+      return
+
+    # Headers are read in parallel, a high latency mount then costs about one round trip per batch
+    each = map
+    if len(paths) > 1 and self.threads > 1:
+      if self.executor is None:
+        self.executor = ThreadPoolExecutor(self.threads, thread_name_prefix='sniff')
+      each = self.executor.map
+
+    misses = []
+    for path, key in zip(paths, each(self.stat, paths)):
+      found, extension = self.lookup(key) if key else (True, None)
+      if found:
+        self.verdicts[path] = extension
+      else:
+        misses.append((path, key))
+
+    for (path, key), (extension, readable) in zip(misses, each(self.read, [path for path, key in misses])):
+      self.verdicts[path] = extension
+      if readable:
+        self.store(key, extension)
+      if extension:
+        logger.debug('Sniffed %s as %s', path, extension)
+
+  def ignored(self, name):
+    # Downloads in progress would be sniffed as the complete file
+    return name in config.skippedFiles or any(fnmatch.fnmatch(name, pattern) for pattern in config.partialFiles)
+
+  def stat(self, path):
+    try:
+      s = os.stat(path)
+    except OSError:
+      return None
+    if not stat.S_ISREG(s.st_mode) or s.st_size == 0:
+      return None
+    return (s.st_dev, s.st_ino, s.st_mtime_ns, s.st_size)
+
+  def read(self, path):
+    try:
+      fd = os.open(path, os.O_RDONLY)
+      try:
+        return sniff(os.pread(fd, headerSize, 0)), True
+      finally:
+        os.close(fd)
+    except OSError as e:
+      logger.debug('Unable to read %s: %s', path, e)
+      return None, False
+
+  def lookup(self, key):
+    if self.cachePath and self.cache is None:
+      try:
+        self.cache = VerdictCache(self.cachePath)
+      except Exception as e:
+        logger.warning('Unable to open type cache %s: %s', self.cachePath, e)
+        self.cachePath = None
+
+    return self.cache.get(key) if self.cache else (False, None)
+
+  def store(self, key, extension):
+    if self.cache:
+      self.cache.put(key, extension)
+
+  def close(self):
+    if self.executor:
+      self.executor.shutdown()
+      self.executor = None
+    if self.cache:
+      self.cache.close()
+      self.cache = None
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+import os
+
+from organizer.normalization import *
+
+logger = logging.getLogger(__name__)
+
+class NameFilter:
+  batchSize = 4096
+
+  def __init__(self, cleaner, null=False, json=False):
+    self.cleaner = cleaner
+    self.delimiter = b'\0' if null else b'\n'
+    self.json = json
+
+  def filter(self, input, output):
+    count = 0
+    for records, batch in self.cleaner.normalizeAll(self.batches(self.read(input))):
+      for record, normalization in zip(records, batch):
+        output.write(self.format(record, normalization))
+      count += len(batch)
+    output.flush()
+    logger.debug('Normalized %s names', count)
+
+  def read(self, input):
+    pending = b''
+    while True:
+      chunk = input.read1(1 << 16)
+      if not chunk:
+        break
+      records = (pending + chunk).split(self.delimiter)
+      pending = records.pop()
+      for record in records:
+        if record:
+          yield os.fsdecode(record)
+    if pending:
+      yield os.fsdecode(pending)
+
+  def batches(self, records):
+    # The input records travel in place of the directory of each batch
+    originals, batch = [], []
+    for record in records:
+      originals.append(record)
+      batch.append(self.parse(record))
+      if len(batch) == self.batchSize:
+        yield originals, batch
+        originals, batch = [], []
+    if batch:
+      yield originals, batch
+
+  def parse(self, record):
+    path = record.rstrip('/')
+    directory, name = os.path.split(path)
+    if not name:
+      # Nothing to normalize, e.g. "/"
+      return DirectoryNormalization('', record)
+    elif path != record:
+      return DirectoryNormalization(directory, name)
+    else:
+      return FileNormalization(directory, name)
+
+  def format(self, original, normalization):
+    normalized = normalization.normalized(True)
+    if original.endswith('/') and normalized != original:
+      normalized += '/'
+
+    if self.json:
+      return (json.dumps({'original': original, 'normalized': normalized}) + '\n').encode('utf-8', 'surrogateescape')
+    return os.fsencode(original) + b'\t' + os.fsencode(normalized) + self.delimiter
@@ -1,6 +1,5 @@
 # -*- coding: utf-8 -*-
 
-import inspect
 import logging
 import re
 
@@ -8,22 +7,32 @@ logger = logging.getLogger(__name__)
 
 class Substitution:
   def __init__(self, pattern, replacement, ext = None, flags = re.IGNORECASE|re.UNICODE):
-    self.pattern = re.compile(pattern, flags=flags)
+    self.source = pattern
+    self.flags = flags
+    self.compiled = None
     self.replacement = replacement
     self.ext = ext
 
-    if inspect.isfunction(self.replacement) or inspect.ismethod(self.replacement):
-      self.display = "Substitution '%s' = lambda(m)" % self.pattern.pattern
+    if callable(self.replacement):
+      self.display = "Substitution '%s' = lambda(m)" % pattern
     else:
-      self.display = "Substitution '%s' = '%s'" % (self.pattern.pattern, self.replacement)
+      self.display = "Substitution '%s' = '%s'" % (pattern, self.replacement)
+
+  @property
+  def pattern(self):
+    # Compiled on first use so starting the command line doesn't pay for every rule
+    if self.compiled is None:
+      self.compiled = re.compile(self.source, flags=self.flags)
+    return self.compiled
 
   def replace(self, normalization):
     name = normalization.getName()
 
     if self.ext == None or self.ext.matches(normalization.getExtension()):
-      name = re.sub(self.pattern, self.replacement, name)
+      name = self.pattern.sub(self.replacement, name)
 
-    logger.debug('%s => %s', self, name)
+    if logger.isEnabledFor(logging.DEBUG):
+      logger.debug('%s => %s', self, name)
     normalization.setName(name)
 
   def __str__(self):
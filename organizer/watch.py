@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+
+import ctypes
+import ctypes.util
+import fnmatch
+import logging
+import os
+import select
+import struct
+import time
+
+from organizer import config
+from organizer import metrics
+from organizer.normalization import *
+from organizer.scanner import Scanner, listDirectory
+
+logger = logging.getLogger(__name__)
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+IN_NONBLOCK = 0o4000
+
+eventHeader = struct.Struct('iIII')
+
+class Inotify:
+  mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF | IN_ONLYDIR
+
+  def __init__(self):
+    libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+    self.addWatch = libc.inotify_add_watch
+    self.addWatch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    if self.fd < 0:
+      error = ctypes.get_errno()
+      raise OSError(error, os.strerror(error))
+    self.directories = {}
+
+  def fileno(self):
+    return self.fd
+
+  def watch(self, directory):
+    wd = self.addWatch(self.fd, os.fsencode(directory), self.mask)
+    if wd < 0:
+      error = ctypes.get_errno()
+      logger.debug('Unable to watch %s: %s', directory, os.strerror(error))
+      return
+    self.directories[wd] = directory
+
+  def read(self):
+    events = []
+    try:
+      data = os.read(self.fd, 1 << 16)
+    except BlockingIOError:
+      return events
+
+    offset = 0
+    while offset < len(data):
+      wd, mask, cookie, length = eventHeader.unpack_from(data, offset)
+      offset += eventHeader.size
+      name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+      offset += length
+
+      if mask & IN_Q_OVERFLOW:
+        logger.warning('Missed file system events, rescanning')
+        events.append((None, None, True))
+      elif mask & IN_IGNORED:
+        self.directories.pop(wd, None)
+      elif wd in self.directories and name:
+        events.append((self.directories[wd], name, bool(mask & IN_ISDIR)))
+
+    return events
+
+  def close(self):
+    os.close(self.fd)
+
+class Poller:
+  def __init__(self, interval):
+    self.interval = interval
+    self.directories = {}
+
+  def fileno(self):
+    return None
+
+  def watch(self, directory):
+    self.directories[directory] = self.snapshot(directory)
+
+  def snapshot(self, directory):
+    try:
+      mtime = os.stat(directory).st_mtime_ns
+    except OSError:
+      return None
+    listing = listDirectory(directory)
+    return mtime, set(listing.directories) if listing else set(), set(listing.files) if listing else set()
+
+  def read(self):
+    events = []
+    for directory, snapshot in list(self.directories.items()):
+      try:
+        mtime = os.stat(directory).st_mtime_ns
+      except OSError:
+        del self.directories[directory]
+        continue
+
+      if snapshot is not None and snapshot[0] == mtime:
+        continue
+
+      current = self.snapshot(directory)
+      self.directories[directory] = current
+      previousDirectories, previousFiles = (snapshot[1], snapshot[2]) if snapshot else (set(), set())
+      events.extend((directory, name, True) for name in current[1] - previousDirectories)
+      events.extend((directory, name, False) for name in current[2] - previousFiles)
+
+    return events
+
+  def close(self):
+    pass
+
+class Watcher:
+  def __init__(self, cleaner, settle=0.5, interval=2.0, poll=False):
+    self.cleaner = cleaner
+    self.root = cleaner.args.directory
+    self.settle = settle
+    self.pending = {}
+    cleaner.produced = set()
+
+    self.source = None
+    if not poll:
+      try:
+        self.source = Inotify()
+      except (OSError, AttributeError) as e:
+        logger.warning('Inotify is not available, polling every %ss: %s', interval, e)
+    if self.source is None:
+      self.source = Poller(interval)
+    self.interval = interval
+
+  def watchTree(self, top):
+    for directory, directories, files in Scanner(self.cleaner.args.scan_threads).walk(top):
+      self.source.watch(directory)
+
+  def partial(self, name):
+    return any(fnmatch.fnmatch(name, pattern) for pattern in config.partialFiles)
+
+  def add(self, directory, name, isDirectory):
+    path = os.path.join(directory, name)
+    junk = self.cleaner.purger is not None and self.cleaner.purger.matches(name)
+    if isDirectory and not junk:
+      self.watchTree(path)
+
+    if path in self.cleaner.produced:
+      self.cleaner.produced.discard(path)
+      return
+
+    if not isDirectory and not junk and (self.partial(name) or name in config.skippedFiles):
+      return
+
+    # The size is taken now, so a finished file is ready after a single settle period
+    try:
+      size = self.measure(path, isDirectory)
+    except OSError:
+      return
+    self.pending[path] = (time.monotonic() + self.settle, isDirectory, size)
+
+  def measure(self, path, isDirectory):
+    if not isDirectory:
+      return os.lstat(path).st_size
+
+    # The number, total size and latest mtime of the entries of a new directory, or None while a download in it is unfinished
+    os.lstat(path)
+    count = size = mtime = 0
+    partial = False
+    for directory, directories, files in Scanner(self.cleaner.args.scan_threads).walk(path):
+      count += len(directories)
+      for name in files:
+        partial = partial or self.partial(name)
+        try:
+          stat = os.lstat(os.path.join(directory, name))
+        except OSError:
+          continue
+        count += 1
+        size += stat.st_size
+        mtime = max(mtime, stat.st_mtime_ns)
+    return None if partial else (count, size, mtime)
+
+  def ready(self):
+    now = time.monotonic()
+    ready = []
+    for path, (deadline, isDirectory, size) in list(self.pending.items()):
+      if deadline > now:
+        continue
+
+      try:
+        current = self.measure(path, isDirectory)
+      except OSError:
+        del self.pending[path]
+        continue
+
+      # Still growing, e.g. written without a temporary name, or a directory still being downloaded into
+      if current is None or size != current:
+        self.pending[path] = (now + self.settle, isDirectory, current)
+        continue
+
+      del self.pending[path]
+      ready.append((path, isDirectory))
+
+    # Entries of a directory that is still pending are cleaned with the rest of its subtree later
+    waiting = [path for path, (deadline, isDirectory, size) in self.pending.items() if isDirectory]
+    return [(path, isDirectory) for path, isDirectory in ready if not any(path.startswith(directory + os.sep) for directory in waiting)]
+
+  def complete(self, batches):
+    # Downloads in progress keep their name until the client renames them
+    for directory, batch in batches:
+      yield directory, [normalization for normalization in batch if isinstance(normalization, DirectoryNormalization) or not self.partial(normalization.original())]
+
+  def timeout(self):
+    if not self.pending:
+      timeout = None if self.source.fileno() is not None else self.interval
+    else:
+      timeout = max(0, min(deadline for deadline, isDirectory, size in self.pending.values()) - time.monotonic())
+      timeout = timeout if self.source.fileno() is not None else min(timeout, self.interval)
+
+    # Wake up to rewrite the metrics even when nothing happens
+    if metrics.registry:
+      return metrics.registry.remaining() if timeout is None else min(timeout, metrics.registry.remaining())
+    return timeout
+
+  def batches(self, ready):
+    ready.sort()
+    directories = [path for path, isDirectory in ready if isDirectory]
+    groups = {}
+
+    for path, isDirectory in ready:
+      # Entries inside a new directory are cleaned with the rest of its subtree
+      if any(path.startswith(directory + os.sep) for directory in directories):
+        continue
+
+      parent, name = os.path.split(path)
+      if self.cleaner.purger is not None and self.cleaner.purger.matches(name):
+        self.cleaner.purger.purge(parent, [(name, isDirectory)])
+      else:
+        groups.setdefault(parent, []).append((name, isDirectory))
+
+    for directory, entries in sorted(groups.items(), key=lambda item: item[0].count(os.sep), reverse=True):
+      for name, isDirectory in entries:
+        if isDirectory:
+          yield from self.complete(self.cleaner.batches(os.path.join(directory, name)))
+
+      batch = [DirectoryNormalization(directory, name) for name, isDirectory in entries if isDirectory]
+      batch.extend(FileNormalization(directory, name) for name, isDirectory in entries if not isDirectory)
+      yield directory, batch
+
+  def watch(self):
+    # Renames of the first pass happened before anything was watched
+    self.cleaner.produced.clear()
+    self.watchTree(self.root)
+    logger.info('Watching %s', self.root)
+
+    try:
+      while True:
+        if self.source.fileno() is not None:
+          readable, writable, exceptional = select.select([self.source], [], [], self.timeout())
+        else:
+          time.sleep(self.timeout())
+
+        for directory, name, isDirectory in self.source.read():
+          if directory is None:
+            self.watchTree(self.root)
+            self.cleaner.cleanAll(self.complete(self.cleaner.batches(self.root)))
+          else:
+            self.add(directory, name, isDirectory)
+
+        ready = self.ready()
+        if ready:
+          logger.debug('Cleaning %s new entries', len(ready))
+          self.cleaner.cleanAll(self.batches(ready))
+
+        if metrics.registry:
+          metrics.registry.flush()
+    finally:
+      self.source.close()
@@ -17,7 +17,7 @@ setup(
     author_email='',
     url='https://github.com/stevensheehy/file-organizer',
     license=license,
-    packages=find_packages(exclude=('test', 'docs')),
+    packages=find_packages(exclude=('test', 'docs', 'benchmarks')),
     entry_points={'console_scripts': ['organizer = organizer.main:main']},
     test_suite='TestCleaner'
 )
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import unittest
+from organizer.cache import *
+from organizer.cleaner import FileCleaner
+from organizer.main import arguments
+from organizer.normalization import *
+
+class TestCache(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.TemporaryDirectory()
+    self.path = os.path.join(self.directory.name, 'names.db')
+
+  def tearDown(self):
+    self.directory.cleanup()
+
+  def test_hit(self):
+    cache = NormalizationCache(self.path, 10, 'a')
+    self.put(cache, 'foo.mkv', 'Foo')
+    cache.close()
+
+    cache = NormalizationCache(self.path, 10, 'a')
+    self.assertEqual('Foo', cache.get(FileNormalization('.', 'foo.mkv'), 140))
+    self.assertIsNone(cache.get(DirectoryNormalization('.', 'foo.mkv'), 140))
+    self.assertIsNone(cache.get(FileNormalization('.', 'foo.mkv'), 8))
+    cache.close()
+
+  def test_fingerprint(self):
+    cache = NormalizationCache(self.path, 10, 'a')
+    self.put(cache, 'foo.mkv', 'Foo')
+    cache.close()
+
+    cache = NormalizationCache(self.path, 10, 'b')
+    self.assertIsNone(cache.get(FileNormalization('.', 'foo.mkv'), 140))
+    cache.close()
+
+  def test_evict(self):
+    cache = NormalizationCache(self.path, 2, 'a')
+    self.put(cache, 'a.mkv', 'A')
+    self.put(cache, 'b.mkv', 'B')
+    cache.close()
+
+    cache = NormalizationCache(self.path, 2, 'a')
+    cache.get(FileNormalization('.', 'a.mkv'), 140)
+    self.put(cache, 'c.mkv', 'C')
+    cache.close()
+
+    cache = NormalizationCache(self.path, 2, 'a')
+    self.assertEqual('A', cache.get(FileNormalization('.', 'a.mkv'), 140))
+    self.assertIsNone(cache.get(FileNormalization('.', 'b.mkv'), 140))
+    self.assertEqual('C', cache.get(FileNormalization('.', 'c.mkv'), 140))
+    cache.close()
+
+  def test_truncated(self):
+    cleaner = FileCleaner(arguments(['--max-length', '12']))
+    for run in range(2):
+      cleaner.cache = NormalizationCache(self.path, 10, 'a')
+      with self.assertLogs('organizer.cleaner', 'WARNING') as logs:
+        normalization = FileNormalization('.', 'foo bar baz.mkv')
+        cleaner.normalize(normalization)
+      cleaner.cache.close()
+      self.assertEqual('Foo Bar….mkv', normalization.normalized())
+      self.assertIn('Truncated filename length from 15 to 8: Foo Bar Baz.mkv', logs.output[0])
+
+  def test_fingerprint_rules(self):
+    self.assertEqual(fingerprint(), fingerprint())
+
+  def put(self, cache, name, normalized):
+    normalization = FileNormalization('.', name)
+    normalization.name = normalized
+    cache.put(normalization, 140)
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+
+import titlecase
+import unittest
+from organizer.casing import Titlecaser, literalCallback
+from organizer.literal import Literals
+
+class TestCasing(unittest.TestCase):
+
+  def test_library(self):
+    titlecaser = Titlecaser()
+    for text in ['the lord of the rings', 'mcdonald the/an and-of', "o'neil d'artagnan", 'ABC DEF OF THE', 'A.B.C. the',
+                 'mr dr ms', 'a: the end? of', 'sth-the xyz/abc of', 'iPhone eBay', '\tfoo\tthe bar', 'MCDONALD', 'McDONALD x/y//z',
+                 'the  double  space ', 'on', '']:
+      self.assertEqual(titlecase.titlecase(text), titlecaser.titlecase(text), text)
+      self.assertEqual(titlecase.titlecase(text), titlecaser.titlecase(text), text)
+
+  def test_callback(self):
+    titlecaser = Titlecaser(literalCallback(Literals('HDTV', 'iZombie', 'of')))
+    self.assertEqual('Izombie of the HDTV', titlecaser.titlecase('izombie of the hdtv'))
+    self.assertEqual('HDTV Of', titlecaser.titlecase('hdtv of'))
+
+  def test_size(self):
+    titlecaser = Titlecaser(size=2)
+    titlecaser.titlecase('one two three four')
+    self.assertEqual(2, titlecaser.word.cache_info().currsize)
+
+if __name__ == '__main__':
+  unittest.main()
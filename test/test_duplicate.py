@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import unittest
+from organizer.duplicate import *
+
+class TestDuplicate(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.TemporaryDirectory()
+    self.root = self.directory.name
+    self.detector = DuplicateDetector(os.path.join(self.root, 'cache', 'digests.db'))
+
+  def tearDown(self):
+    self.detector.close()
+    self.directory.cleanup()
+
+  def write(self, name, data):
+    path = os.path.join(self.root, name)
+    with open(path, 'wb') as f:
+      f.write(data)
+    return path
+
+  def test_same(self):
+    large = bytes(range(256)) * 4096
+    changed = bytearray(large)
+    changed[100000] ^= 1
+
+    self.assertTrue(self.detector.same(self.write('a', b'data'), self.write('b', b'data')))
+    self.assertFalse(self.detector.same(self.write('c', b'data'), self.write('d', b'other')))
+    self.assertFalse(self.detector.same(self.write('e', b'data'), self.write('f', b'atad')))
+    self.assertTrue(self.detector.same(self.write('g', large), self.write('h', large)))
+    # Outside of the sampled blocks, only the full hash tells them apart
+    self.assertFalse(self.detector.same(self.write('i', large), self.write('j', bytes(changed))))
+    self.assertTrue(self.detector.same(self.write('k', b''), self.write('l', b'')))
+
+  def test_cache(self):
+    large = bytes(range(256)) * 4096
+    first, second = self.write('a', large), self.write('b', large)
+    self.assertTrue(self.detector.same(first, second))
+    self.detector.close()
+
+    self.detector.digest = None
+    self.assertTrue(self.detector.same(first, second))
+
+  def test_policies(self):
+    target = self.write('Name.mkv', b'data')
+    detector = DuplicateDetector()
+
+    self.assertIsNone(CollisionPolicy('skip', detector).resolve(self.write('a', b'data'), target))
+    self.assertTrue(os.path.exists(os.path.join(self.root, 'a')))
+    self.assertEqual(target, CollisionPolicy('skip', detector).resolve(target, target))
+
+    self.assertIsNone(CollisionPolicy('dedupe', detector).resolve(self.write('b', b'other'), target))
+    self.assertIsNone(CollisionPolicy('dedupe', detector).resolve(self.write('c', b'data'), target))
+    self.assertFalse(os.path.exists(os.path.join(self.root, 'c')))
+
+    policy = CollisionPolicy('suffix', detector)
+    self.assertEqual(os.path.join(self.root, 'Name (2).mkv'), policy.resolve(self.write('d', b'other'), target))
+    policy.reserve(os.path.join(self.root, 'Name (2).mkv'), os.path.join(self.root, 'd'))
+    self.assertEqual(os.path.join(self.root, 'Name (3).mkv'), policy.resolve(self.write('e', b'third'), target))
+    self.assertIsNone(policy.resolve(self.write('f', b'other'), target))
+
+if __name__ == '__main__':
+  unittest.main()
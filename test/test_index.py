@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import unittest
+from organizer.index import *
+
+class TestIndex(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.TemporaryDirectory()
+    self.root = os.path.join(self.directory.name, 'root')
+    self.path = os.path.join(self.directory.name, 'index.json')
+    os.makedirs(os.path.join(self.root, 'a', 'b'))
+    os.makedirs(os.path.join(self.root, 'c'))
+
+  def tearDown(self):
+    self.directory.cleanup()
+
+  def test_unchanged(self):
+    self.assertEqual(4, len(self.walk()))
+    self.assertEqual([], self.walk())
+
+  def test_changed(self):
+    self.walk()
+    open(os.path.join(self.root, 'a', 'b', 'foo.mkv'), 'w').close()
+    self.assertEqual([os.path.join(self.root, 'a', 'b')], self.walk())
+
+  def test_incomplete(self):
+    self.walk(clean=False)
+    self.assertEqual(4, len(self.walk()))
+    self.assertEqual([], self.walk())
+
+  def test_renamed(self):
+    index = DirectoryIndex(self.path, self.root, 'a')
+    for directory, directories, files in index.walk():
+      renamed = []
+      if directory == os.path.join(self.root, 'a'):
+        os.rename(os.path.join(directory, 'b'), os.path.join(directory, 'B'))
+        renamed.append(('b', 'B'))
+      index.update(directory, renamed, True)
+    index.save()
+
+    self.assertEqual([], self.walk())
+
+  def test_full(self):
+    self.walk()
+    self.assertEqual(4, len(self.walk(full=True)))
+
+  def test_fingerprint(self):
+    self.walk()
+    self.assertEqual(4, len(self.walk(fingerprint='b')))
+
+  def walk(self, clean=True, full=False, fingerprint='a'):
+    index = DirectoryIndex(self.path, self.root, fingerprint, full)
+    visited = []
+    for directory, directories, files in index.walk():
+      visited.append(directory)
+      index.update(directory, [], clean)
+    index.save()
+    return visited
+
+if __name__ == '__main__':
+  unittest.main()
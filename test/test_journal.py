@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import unittest
+from organizer.journal import *
+
+class TestJournal(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.TemporaryDirectory()
+    self.root = self.directory.name
+    self.path = os.path.join(self.root, 'plan.jsonl')
+    os.makedirs(os.path.join(self.root, 'foo dir'))
+    self.touch('foo dir', 'a.mkv')
+    self.touch('foo dir', 'b.mkv')
+
+    plan = Plan(self.path)
+    plan.add('rename', self.join('foo dir', 'a.mkv'), self.join('foo dir', 'A.mkv'))
+    plan.add('rename', self.join('foo dir', 'b.mkv'), self.join('foo dir', 'B.mkv'))
+    plan.add('rename', self.join('foo dir'), self.join('Foo Dir'))
+    plan.add('move', self.join('Foo Dir'), self.join('organized', 'movies', 'Foo Dir'))
+    plan.close()
+
+  def tearDown(self):
+    self.directory.cleanup()
+
+  def test_plan(self):
+    self.assertEqual(['a.mkv', 'b.mkv'], sorted(os.listdir(self.join('foo dir'))))
+
+  def test_apply(self):
+    self.assertTrue(Applier(self.path).apply())
+    self.assertEqual(['A.mkv', 'B.mkv'], sorted(os.listdir(self.join('organized', 'movies', 'Foo Dir'))))
+
+  def test_resume(self):
+    os.rename(self.join('foo dir', 'a.mkv'), self.join('foo dir', 'A.mkv'))
+    journal = Journal(self.path)
+    journal.record(0, 'done')
+    journal.close()
+    with open(self.path + '.journal', 'a') as f:
+      f.write('{"index": 1, "sta')
+
+    self.assertTrue(Applier(self.path).apply())
+    self.assertEqual(['A.mkv', 'B.mkv'], sorted(os.listdir(self.join('organized', 'movies', 'Foo Dir'))))
+
+  def test_undo(self):
+    Applier(self.path).apply()
+    self.assertTrue(Applier(self.path).undo())
+    self.assertEqual(['a.mkv', 'b.mkv'], sorted(os.listdir(self.join('foo dir'))))
+    self.assertEqual([], os.listdir(self.join('organized', 'movies')))
+
+  def test_replan(self):
+    self.assertTrue(Applier(self.path).apply())
+
+    self.touch('c.mkv')
+    self.touch('d.mkv')
+    plan = Plan(self.path)
+    plan.add('rename', self.join('c.mkv'), self.join('C.mkv'))
+    plan.add('rename', self.join('d.mkv'), self.join('D.mkv'))
+    plan.close()
+    self.assertTrue(Applier(self.path).apply())
+    self.assertEqual(['C.mkv', 'D.mkv', 'organized'], sorted(name for name in os.listdir(self.root) if not name.startswith('plan')))
+
+  def test_other_journal(self):
+    Applier(self.path).apply()
+    with open(self.path + '.journal') as f:
+      journal = f.read()
+
+    # A journal copied back, or left by a tool that writes plans without Plan
+    plan = Plan(self.path)
+    plan.add('rename', self.join('Foo Dir'), self.join('Bar Dir'))
+    plan.close()
+    os.rename(self.join('organized', 'movies', 'Foo Dir'), self.join('Foo Dir'))
+    with open(self.path + '.journal', 'w') as f:
+      f.write(journal)
+
+    with self.assertLogs('organizer.journal', 'WARNING'):
+      self.assertTrue(Applier(self.path).apply())
+    self.assertTrue(os.path.isdir(self.join('Bar Dir')))
+
+  def join(self, *names):
+    return os.path.join(self.root, *names)
+
+  def touch(self, *names):
+    open(self.join(*names), 'w').close()
+
+if __name__ == '__main__':
+  unittest.main()
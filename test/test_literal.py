@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import random
+import re
+import tempfile
+import unittest
+from organizer import config
+from organizer import pipeline
+from organizer.literal import *
+from organizer.normalization import FileNormalization
+from organizer.cleaner import normalize
+
+class TestLiteral(unittest.TestCase):
+
+  def test_alternation(self):
+    generator = random.Random(0)
+    words = [''.join(generator.choice('ab-.') for i in range(generator.randint(1, 4))) for j in range(40)] + ['DC', 'DCP', 'vs', 'vs\\.']
+    literals = Literals(*words)
+    flat = '|'.join(re.escape(word) for word in sorted(set(words)))
+
+    for template in [r'\b(%s)\b', r'(%s)-', r'%s']:
+      expected = re.compile(template % flat, re.IGNORECASE)
+      actual = re.compile(template % literals.pattern, re.IGNORECASE)
+      for i in range(500):
+        text = ''.join(generator.choice('ab-. ') for i in range(10))
+        self.assertEqual([m.span() for m in expected.finditer(text)], [m.span() for m in actual.finditer(text)], text)
+
+  def test_nested(self):
+    literals = Literals(Literals('C-3PO', '-san'), 'DC')
+    self.assertEqual(['-san', 'C-3PO', 'DC'], list(literals.literals.values()))
+    self.assertTrue(literals.matches('c-3po'))
+    self.assertFalse(Literals('').matches('mkv'))
+
+  def test_load(self):
+    with tempfile.TemporaryDirectory() as directory:
+      text = os.path.join(directory, 'groups.txt')
+      with open(text, 'w') as f:
+        f.write('# groups\nNTb\n\n  SiGMA  \n')
+      self.assertEqual(['NTb', 'SiGMA'], list(Literals.load(text).literals.values()))
+
+      path = os.path.join(directory, 'titles.json')
+      with open(path, 'w') as f:
+        json.dump(['iCarly', 'QI'], f)
+      self.assertEqual(['QI', 'iCarly'], list(Literals.load(path).literals.values()))
+
+  def test_extend(self):
+    previous = config.literals, list(config.postSubstitutions), list(config.extraLiterals)
+    try:
+      config.extendLiterals(Literals('NTb', 'iCarly'))
+      normalization = FileNormalization('.', 'best.of.icarly.s01e02.ntb.mkv')
+      normalize(normalization, 140)
+      self.assertEqual('Best of iCarly S01E02 NTb.mkv', normalization.normalized())
+    finally:
+      config.literals, config.postSubstitutions[:], config.extraLiterals[:] = previous
+      pipeline.reset()
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+import json
+import logging
+import os
+import tempfile
+import unittest
+from organizer import cleaner
+from organizer import metrics
+from organizer.normalization import FileNormalization
+
+class TestMetrics(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.TemporaryDirectory()
+    self.prometheus = os.path.join(self.directory.name, 'organizer.prom')
+    self.json = os.path.join(self.directory.name, 'organizer.json')
+    self.registry = metrics.start(self.prometheus, self.json, 0)
+
+  def tearDown(self):
+    metrics.stop()
+    self.directory.cleanup()
+
+  def test_histogram(self):
+    for seconds in [0.00001, 0.0003, 0.0003, 20]:
+      self.registry.observe('stat', seconds)
+
+    buckets = dict(self.registry.histograms['stat'].cumulative())
+    self.assertEqual(1, buckets[0.00005])
+    self.assertEqual(3, buckets[0.0005])
+    self.assertEqual(3, buckets[10.0])
+    self.assertEqual(4, buckets[float('inf')])
+
+  def test_log(self):
+    logging.getLogger('organizer.mover').error('Unable to move: %s', 'foo')
+    cleaner.normalize(FileNormalization('.', 'foo bar baz.mkv'), 10)
+    self.assertEqual(1, self.registry.counters['errors'])
+    self.assertEqual(1, self.registry.counters['truncations'])
+
+  def test_timed(self):
+    self.assertTrue(metrics.timed('stat', os.path.exists, self.directory.name))
+    self.assertEqual(1, self.registry.histograms['stat'].count)
+
+  def test_merge(self):
+    other = metrics.Metrics()
+    other.count('renames', 3)
+    other.observe('rename', 0.002)
+    other.phase('apply', 1.5)
+    self.registry.count('renames')
+    self.registry.merge(other.snapshot())
+
+    self.assertEqual(4, self.registry.counters['renames'])
+    self.assertEqual(1, self.registry.histograms['rename'].count)
+    self.assertEqual(0, other.counters['renames'])
+
+  def test_write(self):
+    self.registry.count('files', 5)
+    self.registry.observe('rename', 0.002)
+    self.registry.phase('walk', 0.5)
+    self.registry.flush()
+
+    with open(self.prometheus) as f:
+      text = f.read().splitlines()
+    self.assertIn('organizer_files_total 5', text)
+    self.assertIn('organizer_rename_seconds_bucket{le="0.0025"} 1', text)
+    self.assertIn('organizer_rename_seconds_bucket{le="+Inf"} 1', text)
+    self.assertIn('organizer_rename_seconds_count 1', text)
+    self.assertIn('organizer_phase_seconds{phase="walk"} 0.500000', text)
+    self.assertIn('# TYPE organizer_stat_seconds histogram', text)
+
+    with open(self.json) as f:
+      data = json.load(f)
+    self.assertEqual(5, data['counters']['files'])
+    self.assertEqual(1, data['histograms']['rename']['count'])
+    self.assertEqual(['organizer.json', 'organizer.prom'], sorted(os.listdir(self.directory.name)))
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import unittest
+from organizer.mover import *
+
+class TestMover(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.TemporaryDirectory()
+    self.root = self.directory.name
+    self.source = os.path.join(self.root, 'Foo.mkv')
+    with open(self.source, 'wb') as f:
+      f.write(os.urandom(3 << 20))
+    with open(self.source, 'rb') as f:
+      self.data = f.read()
+
+  def tearDown(self):
+    self.directory.cleanup()
+
+  def test_rename(self):
+    target = os.path.join(self.root, 'tv', 'Foo.mkv')
+    Mover().move(self.source, target)
+    self.assertFalse(os.path.exists(self.source))
+    self.assertContent(target)
+
+  def test_missing(self):
+    mover = Mover()
+    target = os.path.join(self.root, 'tv', 'Foo.mkv')
+    with self.assertLogs('organizer.mover', 'ERROR'):
+      mover.submit(os.path.join(self.root, 'Missing.mkv'), os.path.join(self.root, 'tv', 'Missing.mkv'))
+      mover.submit(self.source, target)
+      mover.close()
+    self.assertContent(target)
+
+  def test_copy(self):
+    for method in [name for name, function in methods] + [None]:
+      mover = Mover()
+      mover.disabled.update((name, key) for name, function in methods if name != method for key in self.keys())
+
+      target = os.path.join(self.root, 'copy.mkv')
+      mover.copy(self.source, target)
+      self.assertContent(target)
+      self.assertEqual(os.stat(self.source).st_mtime, os.stat(target).st_mtime)
+      os.unlink(target)
+
+  @unittest.skipUnless(os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK), 'requires /dev/shm')
+  def test_cross_device(self):
+    with tempfile.TemporaryDirectory(dir='/dev/shm') as other:
+      if os.stat(other).st_dev == os.stat(self.root).st_dev:
+        self.skipTest('/dev/shm is on the same device')
+
+      os.makedirs(os.path.join(self.root, 'Season 1'))
+      os.rename(self.source, os.path.join(self.root, 'Season 1', 'Foo.mkv'))
+
+      mover = Mover()
+      mover.submit(os.path.join(self.root, 'Season 1'), os.path.join(other, 'tv', 'Season 1'))
+      mover.close()
+
+      self.assertFalse(os.path.exists(os.path.join(self.root, 'Season 1')))
+      self.assertContent(os.path.join(other, 'tv', 'Season 1', 'Foo.mkv'))
+      self.assertEqual(1, mover.files)
+
+  def keys(self):
+    device = os.stat(self.root).st_dev
+    return [(device, device)]
+
+  def assertContent(self, path):
+    with open(path, 'rb') as f:
+      self.assertEqual(self.data, f.read())
+
+if __name__ == '__main__':
+  unittest.main()
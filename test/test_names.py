@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+
+import logging
+import unittest
+import organizer
+from organizer.normalization import *
+
+class TestNames(unittest.TestCase):
+
+  def test_files(self):
+    self.assertEqual([('the_quick_brown.fox.mkv', 'The Quick Brown Fox.mkv'), ('Done.mkv', 'Done.mkv')],
+                     list(organizer.normalize_names(iter(['the_quick_brown.fox.mkv', 'Done.mkv']))))
+
+  def test_directories(self):
+    self.assertEqual([('some.dir_name.here', 'Some Dir Name Here')], list(organizer.normalize_names(['some.dir_name.here'], kind='directory')))
+
+  def test_max_length(self):
+    [(name, normalized)] = organizer.normalize_names(['long name ' * 5 + '.mkv'], max_length=20)
+    self.assertEqual('Long Name Long ….mkv', normalized)
+
+  def test_kind(self):
+    with self.assertRaises(ValueError):
+      list(organizer.normalize_names(['a'], kind='link'))
+
+  def test_logging(self):
+    handlers = list(logging.getLogger().handlers)
+    list(organizer.normalize_names(['x' * 200]))
+    self.assertEqual(handlers, logging.getLogger().handlers)
+
+  def test_slots(self):
+    self.assertFalse(hasattr(FileNormalization('.', 'a.mkv'), '__dict__'))
+    self.assertFalse(hasattr(DirectoryNormalization('.', 'a'), '__dict__'))
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+from organizer.cleaner import FileCleaner
+from organizer.main import arguments
+from organizer.organizer import *
+from organizer.sniff import Sniffer
+
+class TestOrganizer(unittest.TestCase):
+
+  def setUp(self):
+    self.organizer = Organizer(Args())
+
+  def test_books(self):
+    self.assertType('Foo.epub', 'books')
+    self.assertType('Foo.PDF', 'books')
+
+  def test_manga(self):
+    self.assertType('Foo v01.zip', 'manga')
+    self.assertType('Foo v01.cbz', 'comics')
+
+  def test_video(self):
+    self.assertType('Foo S01E01.mkv', 'tv')
+    self.assertType('Foo s01e01 720p.MP4', 'tv')
+    self.assertType('Foo 01 [HorribleSubs].mkv', 'anime')
+    self.assertType('Foo (1988).mkv', 'movies')
+    self.assertType('Foo S01E01/Bar.mkv', 'tv')
+
+  def test_music(self):
+    self.assertType('Foo.flac', 'music')
+
+  def test_unknown(self):
+    self.assertType('mkv', 'unknown')
+    self.assertType('Foo', 'unknown')
+    self.assertType('Foo.mkv.part', 'unknown')
+    self.assertType('Foo S01E01.', 'unknown')
+
+  def test_ordered(self):
+    for file in ['Foo S01E01.mkv', 'Foo.KMV', 'Foo S01E01\n.mkv', 'deadfish.avi', 'S01E01.mp3', 'Foo.7z']:
+      self.assertIs(self.organizer.classifier.match(file), self.organizer.classifier.classify(file))
+
+  def test_tally(self):
+    types = self.organizer.classifier.tally(['A S01E01.mkv', 'A S01E02.mkv', 'Foo.nfo', 'Foo.jpg', 'B.mkv'])
+    self.assertEqual({'tv': 2, 'movies': 1}, {type.destination: count for type, count in types.items()})
+
+  def test_sniffed(self):
+    with tempfile.TemporaryDirectory() as root:
+      for name, content in [('Foo S01E01', b'\x1a\x45\xdf\xa3'), ('Foo S01E02', b'\x1a\x45\xdf\xa3'), ('Foo', b'%PDF-1.4'), ('Foo.avi.txt', b'Rar!\x1a\x07\x00'), ('Foo.nfo', b'Foo')]:
+        with open(os.path.join(root, name), 'wb') as f:
+          f.write(content)
+
+      self.organizer.sniffer = Sniffer()
+      self.assertType(os.path.join(root, 'Foo S01E01'), 'tv')
+      self.assertType(os.path.join(root, 'Foo'), 'books')
+      self.assertType(os.path.join(root, 'Foo.avi.txt'), 'manga')
+      self.assertType(os.path.join(root, 'Foo.nfo'), 'unknown')
+      self.assertEqual('tv', self.organizer.directoryType(root).destination)
+
+  def test_process(self):
+    with tempfile.TemporaryDirectory() as root:
+      self.tree(root)
+      self.organizer.args.dry_run = False
+      self.organizer.output = os.path.join(root, 'organized')
+      with mock.patch.object(Organizer, 'tallyTree', side_effect=AssertionError('walked twice')):
+        self.organizer.process(root)
+      self.assertEqual(['Foo.epub'], self.listing(root, 'organized', 'books'))
+      self.assertEqual(['Show'], self.listing(root, 'organized', 'tv'))
+
+  def test_pipeline(self):
+    with tempfile.TemporaryDirectory() as root:
+      self.tree(root)
+      output = os.path.join(root, 'organized')
+      with mock.patch.object(Organizer, 'tallyTree', side_effect=AssertionError('walked twice')):
+        FileCleaner(arguments([root, '--output', output])).process()
+
+      self.assertEqual(['organized'], sorted(os.listdir(root)))
+      self.assertEqual(['Foo.epub'], self.listing(output, 'books'))
+      self.assertEqual(['Show'], self.listing(output, 'tv'))
+      self.assertEqual(['Extras', 'The Office S01E01.mkv', 'The Office S01E02.mkv'], self.listing(output, 'tv', 'Show'))
+
+  def tree(self, root):
+    os.makedirs(os.path.join(root, 'Show', 'extras'))
+    for name in ['Show/the_office_s01e01.mkv', 'Show/the_office_s01e02.mkv', 'Show/extras/Foo.mkv', 'Foo.epub']:
+      open(os.path.join(root, name), 'w').close()
+
+  def listing(self, *path):
+    return sorted(os.listdir(os.path.join(*path)))
+
+  def assertType(self, file, destination):
+    self.assertEqual(destination, self.organizer.fileType(file).destination)
+
+class Args:
+  def __init__(self):
+    self.collision = 'skip'
+    self.directory = '.'
+    self.dry_run = True
+    self.interactive = False
+    self.move_jobs = 1
+    self.output = 'organized'
+    self.scan_threads = 1
+
+if __name__ == '__main__':
+  unittest.main()
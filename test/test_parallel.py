@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+import logging
+import os
+import tempfile
+import unittest
+from organizer import cleaner
+from organizer.cache import NormalizationCache, fingerprint
+from organizer.normalization import *
+from organizer.parallel import NormalizationPool
+
+names = ['foo_bar_baz.mkv', 'the.office.s01e01.720p.mkv', 'hello-big-wide-world-again.mp4', 'Already Clean.mkv', 'a' * 150 + '.mkv']
+
+class Recorder(logging.Handler):
+  def __init__(self):
+    super().__init__()
+    self.messages = []
+
+  def emit(self, record):
+    self.messages.append(record.getMessage())
+
+class TestParallel(unittest.TestCase):
+
+  def setUp(self):
+    self.root = logging.getLogger()
+    self.level = self.root.level
+    self.root.setLevel(logging.DEBUG)
+    self.recorder = Recorder()
+
+  def tearDown(self):
+    self.root.setLevel(self.level)
+    self.root.removeHandler(self.recorder)
+
+  def test_order_and_records(self):
+    batches = [('dir%s' % i, self.batch('dir%s' % i)) for i in range(6)]
+    results = []
+    with NormalizationPool(2, 140) as pool:
+      pool.chunkSize = 2
+      for directory, batch, records in pool.normalize(iter(batches)):
+        results.append((directory, [n.normalized() for n in batch], [[r.getMessage() for r in log] for log in records]))
+
+    self.root.addHandler(self.recorder)
+    expected = []
+    for directory, batch in [('dir%s' % i, self.batch('dir%s' % i)) for i in range(6)]:
+      logs = []
+      for normalization in batch:
+        self.recorder.messages = []
+        cleaner.normalize(normalization, 140)
+        logs.append(self.recorder.messages)
+      expected.append((directory, [n.normalized() for n in batch], logs))
+
+    self.assertEqual(expected, results)
+
+  def test_cache_hits_stream(self):
+    with tempfile.TemporaryDirectory() as directory:
+      cache = NormalizationCache(os.path.join(directory, 'names.db'), 1000, fingerprint())
+      try:
+        with NormalizationPool(2, 140, cache) as pool:
+          # Truncated names are never cached
+          list(pool.normalize(iter([('.', self.batch('.', names[:-1]))])))
+          cache.flush()
+
+          pulled = []
+          def batches():
+            for i in range(50):
+              pulled.append(i)
+              yield '.', self.batch('.', names[:-1])
+            yield '.', []
+
+          results = pool.normalize(batches())
+          directory, batch, records = next(results)
+          self.assertEqual(1, len(pulled))
+          self.assertEqual('Foo Bar Baz.mkv', batch[1].normalized())
+          self.assertEqual(50, len(list(results)))
+      finally:
+        cache.close()
+
+  def batch(self, directory, names=names):
+    return [DirectoryNormalization(directory, 'some_dir_name')] + [FileNormalization(directory, name) for name in names]
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+import os
+import pickle
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from organizer import metrics, profile
+from organizer.cleaner import FileCleaner, normalize
+from organizer.main import arguments
+from organizer.normalization import FileNormalization
+from organizer.scanner import listDirectory
+
+class TestProfile(unittest.TestCase):
+
+  def setUp(self):
+    self.profiler = profile.start()
+
+  def tearDown(self):
+    profile.stop()
+
+  def test_outermost(self):
+    with tempfile.TemporaryDirectory() as directory:
+      open(os.path.join(directory, 'a'), 'w').close()
+      move = lambda: metrics.timed('rename', os.renames, os.path.join(directory, 'a'), os.path.join(directory, 'b', 'c'))
+      profile.timed('move', move)
+      self.assertTrue(metrics.timed('stat', os.path.exists, os.path.join(directory, 'b', 'c')))
+      listDirectory(directory)
+
+    self.assertEqual(1, self.calls('move'))
+    self.assertEqual(0, self.calls('rename'))
+    self.assertEqual(1, self.calls('stat'))
+    self.assertEqual(1, self.calls('list'))
+
+  def test_restored(self):
+    profile.stop()
+    originals = (os.rename, os.scandir, os.stat, os.path.exists)
+    with tempfile.TemporaryDirectory() as directory:
+      open(os.path.join(directory, 'a_b.mkv'), 'w').close()
+      cleaner = FileCleaner(arguments(['-n', '--profile-json', os.path.join(directory, 'profile.json'), directory]))
+      def fail(batches):
+        self.assertIs(originals[0], os.rename)
+        self.assertIsNotNone(profile.profiler)
+        raise RuntimeError('failed')
+
+      with mock.patch.object(cleaner, 'cleanAll', fail):
+        with self.assertRaises(RuntimeError):
+          cleaner.process()
+
+    self.assertEqual(originals, (os.rename, os.scandir, os.stat, os.path.exists))
+    self.assertIsNone(profile.profiler)
+
+  def test_inner(self):
+    sleep = self.profiler.timed('sleep', time.sleep)
+    inner = self.profiler.inner()
+    sleep(0.01)
+    self.assertGreaterEqual(self.profiler.inner() - inner, 10000000)
+
+  def test_shares(self):
+    start = time.perf_counter_ns()
+    for name in ['the.office.s01e01.720p.hdtv.x264.mkv', 'foo bar (dvd) [www.example.com].epub', 'lotr_the_return_of_the_king.mkv']:
+      normalize(FileNormalization('.', name), 140)
+    elapsed = time.perf_counter_ns() - start
+
+    self.assertTrue(any(key.startswith('Literals.convert') for key in self.profiler.stats))
+    self.assertLessEqual(sum(stat.total for stat in self.profiler.stats.values()), elapsed)
+
+  def test_threads(self):
+    stat = self.profiler.stat('threads')
+    def add():
+      for i in range(10000):
+        stat.add(1000)
+
+    threads = [threading.Thread(target=add) for i in range(8)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    self.assertEqual(80000, stat.calls)
+    self.assertEqual(80000, pickle.loads(pickle.dumps(stat)).calls)
+
+  def calls(self, key):
+    return self.profiler.stats[key].calls if key in self.profiler.stats else 0
+
+if __name__ == '__main__':
+  unittest.main()
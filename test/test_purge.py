@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import unittest
+from organizer.purge import *
+from organizer.scanner import Scanner
+
+class TestPurge(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.TemporaryDirectory()
+    self.root = self.directory.name
+    os.makedirs(os.path.join(self.root, 'show/__MACOSX/a'))
+    for path in ['show/__MACOSX/a/x', 'show/__MACOSX/y', 'show/e01.mkv', 'show/e01.sample.mkv', '.DS_Store', 'link.url']:
+      with open(os.path.join(self.root, path), 'w') as f:
+        f.write('data')
+
+  def tearDown(self):
+    self.directory.cleanup()
+
+  def walk(self, purger):
+    walk = []
+    for directory, directories, files in Scanner(2, purger=purger).walk(self.root):
+      purger.purge(directory)
+      walk.append((os.path.relpath(directory, self.root), directories, files))
+    purger.close()
+    return walk
+
+  def test_matches(self):
+    purger = Purger(['__MACOSX', '*.url', '*sample*'])
+    self.assertTrue(purger.matches('__MACOSX'))
+    self.assertTrue(purger.matches('Link.url'))
+    self.assertTrue(purger.matches('e01.sample.mkv'))
+    self.assertFalse(purger.matches('e01.mkv'))
+    self.assertFalse(purger.matches('link.url.mkv'))
+    self.assertFalse(Purger([]).matches('__MACOSX'))
+
+  def test_dry_run(self):
+    purger = Purger(['__MACOSX', '.DS_Store', '*.url', '*sample*'], dryRun=True)
+    self.assertEqual([('show', [], ['e01.mkv']), ('.', ['show'], [])], self.walk(purger))
+    self.assertEqual((5, 2, 20), (purger.files, purger.directories, purger.bytes))
+    self.assertTrue(os.path.exists(os.path.join(self.root, 'show/__MACOSX/a/x')))
+
+  def test_purge(self):
+    purger = Purger(['__MACOSX', '.DS_Store', '*.url', '*sample*'])
+    self.walk(purger)
+    self.assertEqual((5, 2, 20), (purger.files, purger.directories, purger.bytes))
+    self.assertEqual(['show'], os.listdir(self.root))
+    self.assertEqual(['e01.mkv'], os.listdir(os.path.join(self.root, 'show')))
+
+if __name__ == '__main__':
+  unittest.main()
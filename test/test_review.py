@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+import io
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from organizer.cleaner import FileCleaner
+from organizer.main import arguments
+from organizer.prefetch import Prefetcher
+
+class TestReview(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.TemporaryDirectory()
+    self.root = self.directory.name
+    for name in ['foo_bar_baz.mkv', 'hello_big_world.mp4', 'the_office_s01e01.mkv']:
+      open(os.path.join(self.root, name), 'w').close()
+
+  def tearDown(self):
+    self.directory.cleanup()
+
+  def test_prefetch(self):
+    self.assertEqual(list(range(100)), list(Prefetcher(range(100), 4)))
+
+  def test_prefetch_error(self):
+    def failing():
+      yield 1
+      raise OSError('Stale file handle')
+
+    with self.assertRaises(OSError):
+      list(Prefetcher(failing()))
+
+  def test_prefetch_close(self):
+    closed = threading.Event()
+    def endless():
+      try:
+        while True:
+          yield 1
+      finally:
+        closed.set()
+
+    prefetcher = Prefetcher(endless(), 2)
+    self.assertEqual(1, next(iter(prefetcher)))
+    prefetcher.close()
+    self.assertTrue(closed.is_set())
+
+  def test_accept(self):
+    self.assertEqual(['Foo Bar Baz.mkv', 'Hello Big World.mp4', 'The Office S01E01.mkv'], self.review(['y']))
+
+  def test_skip_and_edit(self):
+    self.assertEqual(['Foo Bar Baz.mkv', 'Other.mp4', 'the_office_s01e01.mkv'], self.review(['s 2-3', 's 2', 'e 2', 'Other', 'y']))
+
+  def test_reject(self):
+    self.assertEqual(['foo_bar_baz.mkv', 'hello_big_world.mp4', 'the_office_s01e01.mkv'], self.review(['x 1', 'n']))
+
+  def review(self, answers):
+    answers = iter(answers)
+    with mock.patch('builtins.input', lambda prompt='': next(answers)), mock.patch('sys.stdout', io.StringIO()):
+      FileCleaner(arguments([self.root, '--review'])).process()
+    self.assertEqual([], list(answers))
+    return sorted(os.listdir(self.root))
+
+if __name__ == '__main__':
+  unittest.main()
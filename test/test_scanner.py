@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import unittest
+from organizer.scanner import *
+
+class TestScanner(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.TemporaryDirectory()
+    self.root = self.directory.name
+    for path in ['b/d/e', 'b/c', 'a', 'f']:
+      os.makedirs(os.path.join(self.root, path))
+    for path in ['z.mkv', 'b/y.mkv', 'b/d/e/x.mkv', 'a/w.mkv']:
+      open(os.path.join(self.root, path), 'w').close()
+    os.symlink(os.path.join(self.root, 'b'), os.path.join(self.root, 'link'))
+
+  def tearDown(self):
+    self.directory.cleanup()
+
+  def test_walk(self):
+    for threads in [1, 4]:
+      walk = [(os.path.relpath(d, self.root), dirs, files) for d, dirs, files in Scanner(threads).walk(self.root)]
+      self.assertEqual([
+        ('a', [], ['w.mkv']),
+        ('b/c', [], []),
+        ('b/d/e', [], ['x.mkv']),
+        ('b/d', ['e'], []),
+        ('b', ['c', 'd'], ['y.mkv']),
+        ('f', [], []),
+        ('.', ['a', 'b', 'f', 'link'], ['z.mkv'])
+      ], walk)
+
+  def test_os_walk(self):
+    expected = sorted((d, sorted(dirs), sorted(files)) for d, dirs, files in os.walk(self.root, topdown=False))
+    self.assertEqual(expected, sorted(Scanner(8, 2).walk(self.root)))
+
+  def test_spill(self):
+    expected = list(Scanner(1).walk(self.root))
+    for threads in [1, 4]:
+      walk = [(d, list(dirs), list(files)) for d, dirs, files in Scanner(threads, limit=2).walk(self.root)]
+      self.assertEqual(expected, walk)
+
+  def test_sorted_spill(self):
+    names = ['%04d' % ((i * 7919) % 1000) for i in range(1000)] + ['é', 'ß']
+    spill = SortedSpill(64)
+    for name in names:
+      spill.append(name)
+    self.assertEqual(15, len(spill.runs))
+    self.assertEqual(sorted(names), list(spill.sorted()))
+    self.assertEqual(sorted(names), list(spill))
+
+  def test_missing(self):
+    self.assertEqual([], list(Scanner(4).walk(os.path.join(self.root, 'missing'))))
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from organizer.cleaner import FileCleaner
+from organizer.main import arguments
+from organizer.shard import *
+
+class TestShard(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.TemporaryDirectory()
+    self.root = self.directory.name
+
+  def tearDown(self):
+    self.directory.cleanup()
+
+  def test_device_limit(self):
+    shards = ShardQueue(3, 1)
+    for id, device in enumerate([1, 1, 2, 1]):
+      shards.push(Shard(id, 'root', str(id), device))
+
+    self.assertEqual(['0', '2'], [shards.pop().directory, shards.pop().directory])
+    self.assertIsNone(shards.pop())
+
+    shards.done(Shard(0, 'root', '0', 1))
+    self.assertEqual('1', shards.pop().directory)
+
+  def test_split_after_subtrees(self):
+    shards = ShardQueue(4, 4)
+    parent = Shard(0, 'root', 'root', 1)
+    children = [Shard(1, 'root', 'root/a', 1, parent), Shard(2, 'root', 'root/b', 1, parent)]
+    parent.remaining = 2
+    for child in children:
+      shards.push(child)
+
+    self.assertEqual(children, [shards.pop(), shards.pop()])
+    shards.done(children[1])
+    self.assertIsNone(shards.pop())
+    shards.done(children[0])
+    self.assertIs(parent, shards.pop())
+
+  def test_roots(self):
+    roots = [self.create('first', 3), self.create('second', 1), self.create('third', 0)]
+    copies = [shutil.copytree(root, root + '.copy', symlinks=True) for root in roots]
+
+    self.assertTrue(Coordinator(arguments(roots + ['--jobs', '3', '--device-jobs', '2'])).run())
+    for copy in copies:
+      FileCleaner(arguments([copy])).process()
+
+    for root, copy in zip(roots, copies):
+      self.assertEqual(self.tree(copy), self.tree(root))
+      self.assertIn('Foo Bar Baz', self.tree(root))
+
+  def test_plan_spill(self):
+    root = self.create('first', 2)
+    coordinator = Coordinator(arguments([root, self.create('second', 0), '--spill', '2']))
+    with mock.patch('organizer.shard.listDirectory', wraps=listDirectory) as listing:
+      coordinator.plan()
+    self.assertTrue(listing.called)
+    self.assertEqual({2}, {call.args[2] for call in listing.call_args_list})
+
+  def test_overlap(self):
+    first, second = self.create('first', 0), self.create('second', 0)
+    with mock.patch('sys.stderr', io.StringIO()) as stderr, self.assertRaises(SystemExit):
+      arguments([first, second, first + os.sep])
+    self.assertIn('%s overlaps %s' % (first, first + os.sep), stderr.getvalue())
+
+  def create(self, name, depth):
+    root = os.path.join(self.root, name)
+    directory = root
+    for level in range(depth + 1):
+      for i in range(3):
+        os.makedirs(os.path.join(directory, 'foo_bar_baz_%s' % i))
+        open(os.path.join(directory, 'foo_bar_%s_%s.mkv' % (level, i)), 'w').close()
+      open(os.path.join(directory, 'foo_bar_baz'), 'w').close()
+      directory = os.path.join(directory, 'foo_bar_baz_0')
+    return root
+
+  def tree(self, root):
+    return sorted(os.path.relpath(os.path.join(directory, name), root) for directory, directories, files in os.walk(root) for name in directories + files)
+
+if __name__ == '__main__':
+  unittest.main()
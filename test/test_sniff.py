@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+from organizer.sniff import *
+
+mkv = b'\x1a\x45\xdf\xa3\xa3\x42\x86\x81\x01\x42\xf7\x81\x01\x42\xf2\x81\x04\x42\xf3\x81\x08\x42\x82\x88matroska'
+webm = b'\x1a\x45\xdf\xa3\x9f\x42\x86\x81\x01\x42\xf7\x81\x01\x42\xf2\x81\x04\x42\xf3\x81\x08\x42\x82\x84webm'
+epub = b'PK\x03\x04\x0a\x00\x00\x00\x00\x00' + bytes(16) + b'\x08\x00\x00\x00mimetypeapplication/epub+zipPK\x03\x04'
+
+class TestSniff(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.TemporaryDirectory()
+    self.root = self.directory.name
+
+  def tearDown(self):
+    self.directory.cleanup()
+
+  def test_signatures(self):
+    self.assertEqual('mkv', sniff(mkv))
+    self.assertEqual('webm', sniff(webm))
+    self.assertEqual('mp4', sniff(b'\x00\x00\x00\x20ftypisom\x00\x00\x02\x00'))
+    self.assertEqual('mov', sniff(b'\x00\x00\x00\x14ftypqt  \x00\x00\x00\x00'))
+    self.assertEqual('m4a', sniff(b'\x00\x00\x00\x20ftypM4A \x00\x00\x00\x00'))
+    self.assertIsNone(sniff(b'\x00\x00\x00\x18ftypheic\x00\x00\x00\x00'))
+    self.assertEqual('rar', sniff(b'Rar!\x1a\x07\x01\x00'))
+    self.assertEqual('7z', sniff(b'7z\xbc\xaf\x27\x1c\x00\x04'))
+    self.assertEqual('zip', sniff(b'PK\x03\x04\x14\x00' + bytes(20) + b'\x07\x00\x00\x00001.jpg'))
+    self.assertEqual('epub', sniff(epub))
+    self.assertEqual('pdf', sniff(b'%PDF-1.7\n'))
+    self.assertEqual('flac', sniff(b'fLaC\x00\x00\x00\x22'))
+    self.assertEqual('mp3', sniff(b'ID3\x04\x00\x00\x00\x00\x01\x00' + bytes(128) + b'\xff\xfb'))
+    self.assertEqual('flac', sniff(b'ID3\x04\x00\x00\x00\x00\x00\x04' + bytes(4) + b'fLaC'))
+    self.assertIsNone(sniff(b'Just some text'))
+    self.assertIsNone(sniff(b''))
+
+  def test_sniffer(self):
+    paths = [self.create(name, content) for name, content in [('a', mkv), ('b', b'%PDF-1.4'), ('c', b'text'), ('d', b''), ('e.part', mkv)]]
+    sniffer = Sniffer(threads=4)
+    sniffer.sniffAll(paths + [os.path.join(self.root, 'missing')])
+    self.assertEqual(['mkv', 'pdf', None, None, None], [sniffer.sniff(path) for path in paths])
+
+  def test_cache(self):
+    cache = os.path.join(self.root, 'types.db')
+    path = self.create('a', mkv)
+    sniffer = Sniffer(cache)
+    self.assertEqual('mkv', sniffer.sniff(path))
+    sniffer.close()
+
+    # Same inode, mtime and size, so the header isn't read again
+    stat = os.stat(path)
+    with open(path, 'r+b') as f:
+      f.write(b'%PDF-')
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    sniffer = Sniffer(cache)
+    with mock.patch.object(Sniffer, 'read', side_effect=AssertionError('read')):
+      self.assertEqual('mkv', sniffer.sniff(path))
+    sniffer.close()
+
+    os.utime(path)
+    sniffer = Sniffer(cache)
+    self.assertEqual('pdf', sniffer.sniff(path))
+    sniffer.close()
+
+  def create(self, name, content):
+    path = os.path.join(self.root, name)
+    with open(path, 'wb') as f:
+      f.write(content)
+    return path
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+
+import os
+import subprocess
+import sys
+import unittest
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Wall clock budget in seconds for importing organizer.main, about ten times what it takes on a laptop so a loaded runner
+# passes, and still failing if the rules are compiled or heavy modules imported on startup again
+budget = float(os.environ.get('ORGANIZER_IMPORT_BUDGET', 0.5))
+
+# Everything else is imported by the options that need it
+eager = ['organizer', 'organizer.cache', 'organizer.casing', 'organizer.cleaner', 'organizer.config', 'organizer.literal', 'organizer.main', 'organizer.metrics',
+         'organizer.names', 'organizer.normalization', 'organizer.pipeline', 'organizer.profile', 'organizer.scanner', 'organizer.substitution']
+
+class TestStartup(unittest.TestCase):
+
+  def python(self, *args):
+    return subprocess.run([sys.executable] + list(args), cwd=root, check=True, capture_output=True, text=True)
+
+  def test_lazy(self):
+    script = ('import sys; from organizer import config; from organizer.main import arguments; arguments(["."]); '
+              'print(sum(s.compiled is not None for s in config.preSubstitutions + config.postSubstitutions)); print(" ".join(sys.modules))')
+    compiled, modules = self.python('-c', script).stdout.splitlines()
+    self.assertEqual('0', compiled)
+    for module in ['readline', 'titlecase', 'sqlite3', 'hashlib', 'ctypes', 'concurrent.futures.process', 'organizer.journal']:
+      self.assertNotIn(module, modules.split())
+
+  def test_imports(self):
+    modules = self.python('-c', 'import sys; import organizer.main; print(" ".join(sys.modules))').stdout.split()
+    self.assertEqual(eager, sorted(module for module in modules if module.split('.')[0] == 'organizer'))
+    for module in ['readline', 'titlecase', 'sqlite3', 'hashlib', 'ctypes', 'concurrent.futures.process', 'multiprocessing']:
+      self.assertNotIn(module, modules)
+
+  def test_import_time(self):
+    # The fastest of a few runs, a single one can be slowed down by anything else on the machine
+    microseconds = min(int(self.python('-X', 'importtime', '-c', 'import organizer.main').stderr.splitlines()[-1].split('|')[1]) for i in range(3))
+    self.assertLess(microseconds / 1e6, budget)
+
+if __name__ == '__main__':
+  unittest.main()
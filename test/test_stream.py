@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+
+import io
+import unittest
+from organizer.cleaner import FileCleaner
+from organizer.stream import *
+
+class TestStream(unittest.TestCase):
+
+  def filter(self, data, null=False, json=False):
+    cleaner = FileCleaner.__new__(FileCleaner)
+    cleaner.args = Args()
+    cleaner.cache = None
+    cleaner.pool = None
+    output = io.BytesIO()
+    NameFilter(cleaner, null, json).filter(io.BytesIO(data), output)
+    return output.getvalue()
+
+  def test_lines(self):
+    self.assertEqual(b'the_file_name.mkv\tThe File Name.mkv\nsome/path.to_dir/\tsome/Path to Dir/\n',
+                     self.filter(b'the_file_name.mkv\n\nsome/path.to_dir/'))
+
+  def test_null(self):
+    self.assertEqual(b'one\ntwo_three_four.txt\tOne Two Three Four.txt\0', self.filter(b'one\ntwo_three_four.txt\0', null=True))
+
+  def test_json(self):
+    self.assertEqual(b'{"original": "dir/new_caf\\u00e9_menu.mkv", "normalized": "dir/New Caf\\u00e9 Menu.mkv"}\n', self.filter('dir/new_café_menu.mkv'.encode('utf-8'), json=True))
+
+class Args:
+  def __init__(self):
+    self.max_length = 140
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import time
+import unittest
+from organizer.cleaner import FileCleaner
+from organizer.main import arguments
+from organizer.watch import *
+
+class TestWatch(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.TemporaryDirectory()
+    self.root = self.directory.name
+    os.makedirs(os.path.join(self.root, 'a'))
+    self.cleaner = FileCleaner.__new__(FileCleaner)
+    self.cleaner.args = Args(self.root)
+    self.cleaner.index = None
+    self.cleaner.purger = None
+
+  def tearDown(self):
+    self.directory.cleanup()
+
+  def touch(self, path):
+    with open(os.path.join(self.root, path), 'w') as file:
+      file.write('data')
+
+  def test_poll(self):
+    poller = Poller(1)
+    poller.watch(self.root)
+    self.assertEqual([], poller.read())
+
+    self.touch('x.mkv')
+    os.makedirs(os.path.join(self.root, 'b'))
+    os.utime(self.root, ns=(0, 0))
+    self.assertEqual([(self.root, 'b', True), (self.root, 'x.mkv', False)], poller.read())
+
+  def test_settle(self):
+    watcher = Watcher(self.cleaner, 0, poll=True)
+    self.touch('x.mkv')
+    self.touch('y.mkv.part')
+    self.touch('a/z.mkv')
+    for name in ['x.mkv', 'y.mkv.part']:
+      watcher.add(self.root, name, False)
+    watcher.add(self.root, 'a', True)
+    watcher.add(os.path.join(self.root, 'a'), 'z.mkv', False)
+
+    ready = watcher.ready()
+    self.assertEqual([os.path.join(self.root, path) for path in ['x.mkv', 'a', 'a/z.mkv']], [path for path, isDirectory in ready])
+
+    a = os.path.join(self.root, 'a')
+    batches = [(directory, [normalization.original() for normalization in batch]) for directory, batch in watcher.batches(ready)]
+    self.assertEqual([(a, ['z.mkv']), (self.root, ['a', 'x.mkv'])], batches)
+
+  def test_growing(self):
+    watcher = Watcher(self.cleaner, 0, poll=True)
+    self.touch('x.mkv')
+    watcher.add(self.root, 'x.mkv', False)
+    with open(os.path.join(self.root, 'x.mkv'), 'a') as file:
+      file.write('more')
+
+    self.assertEqual([], watcher.ready())
+    self.assertEqual([(os.path.join(self.root, 'x.mkv'), False)], watcher.ready())
+
+  def test_partial_directory(self):
+    cleaner = FileCleaner(arguments([self.root]))
+    cleaner.open()
+    try:
+      watcher = Watcher(cleaner, 0.01, poll=True)
+      os.makedirs(os.path.join(self.root, 'foo.bar.2019'))
+      self.touch('foo.bar.2019/foo.bar.s01e01.mkv.part')
+      self.touch('foo.bar.2019/foo.bar.s01e02.mkv')
+      watcher.add(self.root, 'foo.bar.2019', True)
+      watcher.add(os.path.join(self.root, 'foo.bar.2019'), 'foo.bar.s01e02.mkv', False)
+
+      for i in range(3):
+        time.sleep(0.02)
+        cleaner.cleanAll(watcher.batches(watcher.ready()))
+      self.assertEqual(['a', 'foo.bar.2019'], sorted(os.listdir(self.root)))
+      self.assertEqual(['foo.bar.s01e01.mkv.part', 'foo.bar.s01e02.mkv'], sorted(os.listdir(os.path.join(self.root, 'foo.bar.2019'))))
+
+      # The client renames the finished download
+      os.rename(os.path.join(self.root, 'foo.bar.2019', 'foo.bar.s01e01.mkv.part'), os.path.join(self.root, 'foo.bar.2019', 'foo.bar.s01e01.mkv'))
+      for i in range(3):
+        time.sleep(0.02)
+        cleaner.cleanAll(watcher.batches(watcher.ready()))
+      self.assertEqual(['Foo Bar S01E01.mkv', 'Foo Bar S01E02.mkv'], sorted(os.listdir(os.path.join(self.root, 'Foo Bar 2019'))))
+    finally:
+      cleaner.close()
+
+  def test_complete(self):
+    watcher = Watcher(self.cleaner, 0, poll=True)
+    self.touch('a/foo.bar.mkv.part')
+    self.touch('a/foo.bar.mkv')
+    batches = [(directory, [normalization.original() for normalization in batch]) for directory, batch in watcher.complete(watcher.cleaner.batches(os.path.join(self.root, 'a')))]
+    self.assertEqual([(os.path.join(self.root, 'a'), ['foo.bar.mkv'])], batches)
+
+  def test_produced(self):
+    watcher = Watcher(self.cleaner, 0, poll=True)
+    self.touch('X.mkv')
+    self.cleaner.produced.add(os.path.join(self.root, 'X.mkv'))
+    watcher.add(self.root, 'X.mkv', False)
+    self.assertEqual({}, watcher.pending)
+
+class Args:
+  def __init__(self, directory):
+    self.directory = directory
+    self.scan_threads = 1
+    self.spill = None
+
+if __name__ == '__main__':
+  unittest.main()